@@ -1,23 +1,106 @@
+import argparse
+import os
+import sqlite3
 import sys
+from enum import IntEnum
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QLabel, QPushButton, QLineEdit, 
                            QRadioButton, QButtonGroup, QFrame, QTabWidget,
                            QGroupBox, QTextEdit, QScrollArea, QGridLayout,
-                           QSpacerItem, QSizePolicy)
+                           QSpacerItem, QSizePolicy, QCheckBox, QTableWidget,
+                           QTableWidgetItem, QHeaderView, QAbstractItemView)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont, QColor, QPalette
+import numpy as np
 import pyvisa as visa
+from sweep_average import SweepAccumulator
+from acquisition import SweepAcquisition, SimulatedPowerMeter
+from pipeline import PipelineError, SweepPipeline
+from units import nm_to_thz, thz_to_nm
+from power_flattening import CalibrationStore, CalibrationRun, SteppedSweep
+from campaign import Campaign, CampaignRunner, expand_grid
+from sweep_archive import SweepArchive
+from spectrum_plot import SpectrumPlot
+
+# 功率校准数据、批量任务检查点和扫描存档, 与程序放在同一目录
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CALIBRATION_FILE = os.path.join(APP_DIR, "power_calibration.json")
+CAMPAIGN_FILE = os.path.join(APP_DIR, "campaign_checkpoint.json")
+ARCHIVE_DIR = os.path.join(APP_DIR, "sweep_archive")
+
+class TSLError(Exception):
+    """激光器操作错误基类"""
+
+class NotConnectedError(TSLError):
+    """设备未连接"""
+    def __init__(self, message="设备未连接"):
+        super().__init__(message)
+
+class CommunicationError(TSLError):
+    """VISA通信错误, code 为VISA错误码"""
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+class ParameterError(TSLError):
+    """命令参数无效, 未发送到设备"""
+
+class CommandError(TSLError):
+    """设备错误队列中的SCPI错误"""
+    def __init__(self, code, message):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
+
+class SweepMode(IntEnum):
+    """扫描模式"""
+    STEP_ONE_WAY = 0        # 步进式单向
+    CONTINUOUS_ONE_WAY = 1  # 连续式单向
+    STEP_TWO_WAY = 2        # 步进式往复
+    CONTINUOUS_TWO_WAY = 3  # 连续式往复
+
+class SweepState(IntEnum):
+    """扫描状态"""
+    STOPPED = 0    # 已停止
+    RUNNING = 1    # 扫描中
+    STANDBY = 3    # 等待触发
+    PREPARING = 4  # 准备中
+
+class TriggerOutput(IntEnum):
+    """触发输出时机"""
+    NONE = 0   # 不输出
+    STOP = 1   # 扫描结束时输出
+    START = 2  # 扫描开始时输出
+    STEP = 3   # 每个触发步长输出
+
+class WavelengthUnit(IntEnum):
+    """波长单位"""
+    NM = 0
+    THZ = 1
 
 class TSL570():
-    def __init__(self, model="TSL-570"):
-        self.rm = visa.ResourceManager()
+    """TSL激光器驱动
+
+    设置类方法成功时返回None, 查询类方法返回解析后的数值,
+    失败时抛出 TSLError 的子类。提示信息由界面层负责格式化。
+    所有波长参数和返回值均以nm为单位, 与仪器当前的波长单位无关,
+    需要时在本地换算。
+    """
+    SUPPORTED_MODELS = ("TSL-570", "TSL-550")
+
+    def __init__(self, model="TSL-570", resource_manager=None):
+        # 未指定时使用系统VISA库, 调试时可传入模拟的资源管理器
+        self.rm = resource_manager or visa.ResourceManager()
         self.device = None
         self.connected = False
+        self.tracer = None  # 性能分析模式下记录SCPI命令
+        self.wave_unit = None  # 仪器当前的波长单位, None表示未知
         self.model = model  # 添加型号属性，默认为TSL-570
         self.device_info = {
             "model": model,
             "wavelength_range": "",
-            "max_power": ""
+            "max_power": "",
+            "serial": ""
         }
 
     def get_model(self):
@@ -26,11 +109,9 @@ class TSL570():
 
     def set_model(self, model):
         """设置设备型号"""
-        if model in ["TSL-570", "TSL-550"]:
-            self.model = model
-            return f"设备型号已设置为: {model}"
-        else:
-            return f"不支持的设备型号: {model}"
+        if model not in self.SUPPORTED_MODELS:
+            raise ValueError(f"不支持的设备型号: {model}")
+        self.model = model
 
     def search_gpib_addresses(self):
         """搜索可用的 GPIB 设备地址"""
@@ -39,264 +120,306 @@ class TSL570():
         except:
             return []
 
+    def _write(self, command):
+        """发送一条命令"""
+        if not self.connected:
+            raise NotConnectedError()
+        try:
+            self.device.write(command)
+        except Exception as e:
+            raise CommunicationError(str(e), getattr(e, "error_code", None)) from e
+
+    def _query(self, command):
+        """发送查询命令并返回去掉首尾空白的应答"""
+        self._write(command)
+        try:
+            return self.device.read().strip()
+        except Exception as e:
+            raise CommunicationError(str(e), getattr(e, "error_code", None)) from e
+
+    def _query_array(self, command):
+        """读取4字节小端浮点数的二进制数据块"""
+        if not self.connected:
+            raise NotConnectedError()
+        try:
+            return self.device.query_binary_values(
+                command, datatype='f', is_big_endian=False, container=np.array)
+        except Exception as e:
+            raise CommunicationError(str(e), getattr(e, "error_code", None)) from e
+
+    def _query_value(self, command, convert):
+        """发送查询并用 convert 解析应答, 无法解析时抛出 CommunicationError"""
+        reply = self._query(command)
+        try:
+            return convert(reply)
+        except (ValueError, TypeError) as e:
+            raise CommunicationError(f"{command} 的应答无法解析: {reply!r}") from e
+
+    @staticmethod
+    def _enum_value(enum, value):
+        """将枚举成员、名称或数值转换为 enum 成员, 无效时抛出 ParameterError"""
+        try:
+            if isinstance(value, str):
+                return enum[value.upper()]
+            return enum(value)
+        except (KeyError, ValueError) as e:
+            raise ParameterError(f"无效的{enum.__doc__}: {value}") from e
+
     def connect_device(self, address):
-        """连接到指定地址的设备"""
+        """连接到指定地址的设备并读取设备信息"""
         try:
             self.device = self.rm.open_resource(address)
-            self.connected = True
-            # 连接后立即读取设备信息
-            self.get_device_info()
-            return f"成功连接到设备: {address}"
         except Exception as e:
             self.connected = False
-            return f"连接设备失败: {str(e)}"
+            raise CommunicationError(str(e), getattr(e, "error_code", None)) from e
+        if self.tracer is not None:
+            self.device = self.tracer.wrap(self.device)
+        self.connected = True
+        self.wave_unit = None
+        try:
+            self.get_device_info()
+        except TSLError:
+            # 设备信息读取失败视为连接失败
+            self.connected = False
+            try:
+                self.device.close()
+            except Exception:
+                pass
+            raise
 
     def disconnect(self):
         """断开设备连接"""
-        if self.device:
-            try:
-                self.device.close()
-                self.connected = False
-                return "设备已断开连接"
-            except Exception as e:
-                return f"断开连接失败: {str(e)}"
-        return "设备未连接"
+        if not self.device:
+            raise NotConnectedError()
+        try:
+            self.device.close()
+        except Exception as e:
+            raise CommunicationError(str(e), getattr(e, "error_code", None)) from e
+        self.connected = False
+        self.wave_unit = None
 
     def is_connected(self):
         """返回设备连接状态"""
         return self.connected
 
+    # 读取错误队列的最大条数, 防止设备异常时无限循环
+    ERROR_QUEUE_LIMIT = 32
+
+    def check_errors(self):
+        """读空设备错误队列, 有错误时抛出 CommandError
+
+        code 为第一条错误的代码, 其余错误附在说明中
+        """
+        errors = []
+        for _ in range(self.ERROR_QUEUE_LIMIT):
+            reply = self._query(":SYSTem:ERRor?")
+            code, _, message = reply.partition(",")
+            try:
+                code = int(code)
+            except ValueError as e:
+                raise CommunicationError(f":SYSTem:ERRor? 的应答无法解析: {reply!r}") from e
+            if code == 0:
+                break
+            errors.append((code, message.strip().strip('"')))
+        if errors:
+            code, message = errors[0]
+            message = "; ".join([message] + [f"[{c}] {m}" for c, m in errors[1:]])
+            raise CommandError(code, message)
+
+    def clear_errors(self):
+        """清空设备错误队列, 之后的检查只反映新发送的命令"""
+        self._write("*CLS")
+
     def device_shut_down(self):
         """关闭设备"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write("*RST")
-            return "设备已关闭"
-        except Exception as e:
-            return f"关闭设备失败: {str(e)}"
+        self._write("*RST")
+        self.wave_unit = None
 
     def device_restart(self):
         """重启设备"""
-        if not self.connected:
-            return "设备未连接"
+        self._write("*RST")
+        self.wave_unit = None
+
+    def _instrument_unit(self):
+        """仪器当前的波长单位, 未知时查询一次并缓存"""
+        if self.wave_unit is None:
+            self.read_wave_unit()
+        return self.wave_unit
+
+    def _to_instrument(self, wavelength):
+        """将波长(nm)换算为仪器当前单位的命令参数, 无效时抛出 ParameterError"""
         try:
-            self.device.write("*RST")
-            return "设备已重启"
-        except Exception as e:
-            return f"重启设备失败: {str(e)}"
+            value = float(wavelength)
+        except (TypeError, ValueError) as e:
+            raise ParameterError(f"无效的波长: {wavelength}") from e
+        if self._instrument_unit() == WavelengthUnit.NM:
+            return wavelength
+        return f"{nm_to_thz(value):.6f}"
+
+    def _write_nm(self, command):
+        """发送以nm为单位的命令
+
+        仪器处于THz时, 在同一次写入中临时切换为nm并恢复原单位,
+        不改变操作者设置的单位
+        """
+        unit = self._instrument_unit()
+        if unit == WavelengthUnit.NM:
+            self._write(command)
+        else:
+            self._write(f":UNIT:WAVelength {int(WavelengthUnit.NM)};{command};"
+                        f":UNIT:WAVelength {int(unit)}")
+
+    def _from_instrument(self, value):
+        """将仪器当前单位的数值换算为波长(nm), 支持数组"""
+        if self._instrument_unit() == WavelengthUnit.NM:
+            return value
+        return thz_to_nm(value)
 
     def set_wavelength(self, wavelength):
-        """设置波长"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength {wavelength}")
-            return f"波长已设置为 {wavelength}"
-        except Exception as e:
-            return f"设置波长失败: {str(e)}"
+        """设置波长(nm)"""
+        self._write(f":WAVelength {self._to_instrument(wavelength)}")
+
+    def set_wavelength_power(self, wavelength, power):
+        """在同一条命令中设置波长(nm)和输出功率"""
+        self._write(f":WAVelength {self._to_instrument(wavelength)};"
+                    f":POWer:LEVel {power}")
 
     def set_wave_unit(self, unit):
-        """设置波长单位"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":UNIT:WAVelength {unit}")
-            return f"波长单位已设置为 {unit}"
-        except Exception as e:
-            return f"设置波长单位失败: {str(e)}"
+        """设置仪器的波长单位, unit 为 WavelengthUnit 或其名称
+
+        只影响仪器面板显示和通信, 驱动接口始终使用nm。
+        与缓存的单位相同时不发送命令。
+        """
+        unit = self._enum_value(WavelengthUnit, unit)
+        if unit == self.wave_unit:
+            return
+        self._write(f":UNIT:WAVelength {int(unit)}")
+        self.wave_unit = unit
+
+    def read_wave_unit(self):
+        """读取仪器的波长单位并更新缓存"""
+        self.wave_unit = self._query_value(
+            ":UNIT:WAVelength?", lambda reply: WavelengthUnit(int(float(reply))))
+        return self.wave_unit
 
     def set_power_status(self, status):
         """设置激光器输出状态"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":POWer:STATe {status}")
-            return "激光器输出已" + ("开启" if status == '1' else "关闭")
-        except Exception as e:
-            return f"设置输出状态失败: {str(e)}"
+        self._write(f":POWer:STATe {1 if status in (True, 1, '1') else 0}")
 
     def set_power_level(self, power):
         """设置输出功率"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":POWer:LEVel {power}")
-            return f"输出功率已设置为 {power}"
-        except Exception as e:
-            return f"设置功率失败: {str(e)}"
+        self._write(f":POWer:LEVel {power}")
+
+    def read_wavelength(self):
+        """读取当前波长(nm)"""
+        return float(self._from_instrument(self._query_value(":WAVelength?", float)))
+
+    def read_power(self):
+        """读取当前输出功率"""
+        return self._query_value(":POWer?", float)
+
+    def read_power_status(self):
+        """读取激光器输出状态, 开启时返回True"""
+        return self._query(":POWer:STATe?") == "1"
 
     def set_sweep_mode(self, mode):
-        """设置扫描模式
-        mode: 
-            0: 步进式扫描 单向
-            1: 连续式扫描 单向
-            2: 步进式扫描 往复
-            3: 连续式扫描 往复
-        """
-        if not self.connected:
-            return "设备未连接"
-        try:
-            # 扫描模式映射表
-            MODE = {
-                'STEP_ONE_WAY': '0',      # 步进式单向
-                'CONTINUOUS_ONE_WAY': '1', # 连续式单向
-                'STEP_TWO_WAY': '2',      # 步进式往复
-                'CONTINUOUS_TWO_WAY': '3'  # 连续式往复
-            }
-            
-            # 根据GUI中的组合值转换为设备需要的模式值
-            mode_value = MODE.get(mode, '0')
-            
-            self.device.write(f":WAVelength:SWEep:MODe {mode_value}")
-            return f"扫描模式已设置为 {mode}"
-        except Exception as e:
-            return f"设置扫描模式失败: {str(e)}"
+        """设置扫描模式, mode 为 SweepMode 或其名称"""
+        mode = self._enum_value(SweepMode, mode)
+        self._write(f":WAVelength:SWEep:MODe {int(mode)}")
 
     def set_sweep_start(self, start):
-        """设置扫描起始波长"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength:SWEep:STARt {start}")
-            return f"扫描起始波长已设置为 {start}nm"
-        except Exception as e:
-            return f"设置起始波长失败: {str(e)}"
+        """设置扫描起始波长(nm)"""
+        self._write(f":WAVelength:SWEep:STARt {self._to_instrument(start)}")
 
     def set_sweep_stop(self, stop):
-        """设置扫描结束波长"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength:SWEep:STOP {stop}")
-            return f"扫描结束波长已设置为 {stop}nm"
-        except Exception as e:
-            return f"设置结束波长失败: {str(e)}"
+        """设置扫描结束波长(nm)"""
+        self._write(f":WAVelength:SWEep:STOP {self._to_instrument(stop)}")
 
     def set_sweep_step(self, step):
-        """设置扫描步长(nm)"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength:SWEep:STEP {step}")
-            return f"扫描步长已设置为 {step}nm"
-        except Exception as e:
-            return f"设置步长失败: {str(e)}"
+        """设置扫描步长(nm), 步长无法逐点换算为频率间隔, 始终按nm发送"""
+        self._write_nm(f":WAVelength:SWEep:STEP {step}")
 
     def set_sweep_speed(self, speed):
         """设置扫描速度(nm/s)"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength:SWEep:SPEed {speed}")
-            return f"扫描速度已设置为 {speed}nm/s"
-        except Exception as e:
-            return f"设置扫描速度失败: {str(e)}"
+        self._write(f":WAVelength:SWEep:SPEed {speed}")
             
     def set_dwell_time(self, dwell):
         """设置驻留时间(秒)
         Range: 0 to 999.9 sec
         Step: 0.1 sec
         """
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength:SWEep:DWELl {dwell}")
-            return f"驻留时间已设置为 {dwell}秒"
-        except Exception as e:
-            return f"设置驻留时间失败: {str(e)}"
+        self._write(f":WAVelength:SWEep:DWELl {dwell}")
     
     def set_sweep_cycles(self, cycles):
         """设置扫描循环次数
         Range: 0 to 999
         Step: 1
         """
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(f":WAVelength:SWEep:CYCLes {cycles}")
-            return f"扫描循环次数已设置为 {cycles}次"
-        except Exception as e:
-            return f"设置循环次数失败: {str(e)}"
+        self._write(f":WAVelength:SWEep:CYCLes {cycles}")
+
+    def set_trigger_output(self, mode):
+        """设置触发输出时机, mode 为 TriggerOutput 或其名称"""
+        mode = self._enum_value(TriggerOutput, mode)
+        self._write(f":TRIGger:OUTPut {int(mode)}")
+
+    def set_trigger_step(self, step):
+        """设置触发输出步长(nm), 始终按nm发送"""
+        self._write_nm(f":TRIGger:OUTPut:STEP {step}")
 
     def read_sweep_count(self):
         """读取当前扫描次数"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(":WAVelength:SWEep:COUNt?")
-            count = self.device.read()
-            return f"当前扫描次数: {count}"
-        except Exception as e:
-            return f"读取扫描次数失败: {str(e)}"
+        return self._query_value(":WAVelength:SWEep:COUNt?",
+                                 lambda reply: int(float(reply)))
 
     def start_sweep(self):
         """开始扫描"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(":WAVelength:SWEep:STATe 1")
-            return "扫描已开始"
-        except Exception as e:
-            return f"开始扫描失败: {str(e)}"
+        self._write(":WAVelength:SWEep:STATe 1")
 
     def stop_sweep(self):
         """停止扫描"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(":WAVelength:SWEep:STATe 0")
-            return "扫描已停止"
-        except Exception as e:
-            return f"停止扫描失败: {str(e)}"
+        self._write(":WAVelength:SWEep:STATe 0")
             
     def sweep_repeat(self):
         """重复扫描"""
-        if not self.connected:
-            return "设备未连接"
-        try:
-            self.device.write(":WAVelength:SWEep:REPeat")
-            return "扫描已重复启动"
-        except Exception as e:
-            return f"重复扫描失败: {str(e)}"
+        self._write(":WAVelength:SWEep:REPeat")
+
+    def read_sweep_state(self):
+        """读取扫描状态"""
+        return self._query_value(":WAVelength:SWEep:STATe?",
+                                 lambda reply: SweepState(int(float(reply))))
+
+    def is_sweeping(self):
+        """扫描是否仍在进行"""
+        return self.read_sweep_state() != SweepState.STOPPED
+
+    def read_sweep_data(self):
+        """读取最近一次扫描的记录数据
+        返回 (波长数组(nm), 功率数组), 数据为4字节小端浮点数
+        """
+        wavelength = self._from_instrument(self._query_array(":READout:DATa?"))
+        power = self._query_array(":READout:DATa:POWer?")
+        return wavelength, power
 
     def get_device_info(self):
         """从设备读取设备信息"""
-        if not self.connected:
-            return "设备未连接"
-        
-        try:
-            # 读取设备型号
-            self.device.write("*IDN?")
-            idn = self.device.read()
-            self.device_info["model"] = idn.split(",")[1] if "," in idn else self.model
-            
-            # 根据型号确定波长范围和功率限制
-            # 实际应用中应从设备读取这些信息
-            if "570" in self.device_info["model"]:
-                # 读取波长范围
-                self.device.write(":WAVelength:RANGe?")
-                wavelength_range = self.device.read()
-                self.device_info["wavelength_range"] = wavelength_range
-                
-                # 读取最大功率
-                self.device.write(":POWer:RANGe?")
-                max_power = self.device.read()
-                self.device_info["max_power"] = max_power
-            elif "550" in self.device_info["model"]:
-                # 读取波长范围
-                self.device.write(":WAVelength:RANGe?")
-                wavelength_range = self.device.read()
-                self.device_info["wavelength_range"] = wavelength_range
-                
-                # 读取最大功率
-                self.device.write(":POWer:RANGe?")
-                max_power = self.device.read()
-                self.device_info["max_power"] = max_power
-            
-            return "设备信息已更新"
-        except Exception as e:
-            return f"读取设备信息失败: {str(e)}"
+        idn = self._query("*IDN?")
+        fields = idn.split(",")
+        self.device_info["model"] = fields[1].strip() if len(fields) > 1 else self.model
+        self.device_info["serial"] = fields[2].strip() if len(fields) > 2 else ""
+        
+        # 根据型号确定波长范围和功率限制
+        if any(m[-3:] in self.device_info["model"] for m in self.SUPPORTED_MODELS):
+            wavelength_range = self._query(":WAVelength:RANGe?")
+            if self._instrument_unit() == WavelengthUnit.THZ:
+                try:
+                    limits = sorted(thz_to_nm([float(v) for v in wavelength_range.split(",")]))
+                except ValueError as e:
+                    raise CommunicationError(
+                        f":WAVelength:RANGe? 的应答无法解析: {wavelength_range!r}") from e
+                wavelength_range = ",".join(f"{v:.3f}" for v in limits)
+            self.device_info["wavelength_range"] = wavelength_range
+            self.device_info["max_power"] = self._query(":POWer:RANGe?")
+        return self.device_info
 
 class ColorScheme:
     """颜色方案类"""
@@ -376,9 +499,32 @@ class StyleSheet:
         """
 
 class TSL570GUI(QMainWindow):
-    def __init__(self, model="TSL-570"):
+    # 日志区域保留的最大行数, 长时间运行时旧日志自动丢弃
+    LOG_MAX_BLOCKS = 5000
+
+    def __init__(self, model="TSL-570", resource_manager=None):
         super().__init__()
-        self.tsl = TSL570(model)
+        self.tsl = TSL570(model, resource_manager)
+        # 模拟功率计只能用于模拟激光器, 不能与真实设备的数据混用
+        self.simulated = getattr(resource_manager, "simulated", False)
+        self.sweep_accumulator = None
+        self.acquisition = None
+        self._last_cycle_count = 0
+        self.sweep_running = False
+        self.sweep_params = {}
+        self.archive = None  # 第一次存档或查询时打开
+        self.pipeline = SweepPipeline()
+        self.pipeline_timer = QTimer(self)
+        self.pipeline_timer.timeout.connect(self.poll_pipeline)
+        self.calibration_store = CalibrationStore(CALIBRATION_FILE)
+        self.count_timer = QTimer(self)
+        self.count_timer.timeout.connect(self.update_sweep_count)
+        self.step_task = None
+        self.step_timer = QTimer(self)
+        self.step_timer.timeout.connect(self.advance_step_task)
+        self.campaign_runner = None
+        self.campaign_timer = QTimer(self)
+        self.campaign_timer.timeout.connect(self.advance_campaign)
         self.setup_ui()
         
     def setup_ui(self):
@@ -397,10 +543,13 @@ class TSL570GUI(QMainWindow):
         # 创建选项卡部件
         tab_widget = QTabWidget()
         
-        # 添加三个主要选项卡
+        # 添加主要选项卡
         tab_widget.addTab(self.create_system_tab(), "系统控制")
         tab_widget.addTab(self.create_optical_tab(), "光学参数")
         tab_widget.addTab(self.create_sweep_tab(), "扫频设置")
+        tab_widget.addTab(self.create_campaign_tab(), "批量任务")
+        tab_widget.addTab(self.create_analysis_tab(), "谐振分析")
+        tab_widget.addTab(self.create_history_tab(), "历史记录")
         
         main_layout.addWidget(tab_widget)
         
@@ -631,6 +780,46 @@ class TSL570GUI(QMainWindow):
         
         mode_group.setLayout(mode_layout)
         
+        # 功率计同步采集组
+        meter_group = QGroupBox("功率计同步采集")
+        meter_layout = QHBoxLayout()
+        
+        meter_layout.addWidget(QLabel("功率计:"))
+        self.meter_none = QRadioButton("不使用")
+        self.meter_simulated = QRadioButton("模拟功率计")
+        self.meter_none.setChecked(True)
+        if not self.simulated:
+            self.meter_simulated.setEnabled(False)
+            self.meter_simulated.setToolTip("仅支持模拟设备(--simulate)")
+        meter_layout.addWidget(self.meter_none)
+        meter_layout.addWidget(self.meter_simulated)
+        
+        meter_layout.addWidget(QLabel("触发步长(nm):"))
+        self.trigger_step_input = QLineEdit()
+        self.trigger_step_input.setStyleSheet(StyleSheet.get_line_edit_style())
+        meter_layout.addWidget(self.trigger_step_input)
+        
+        meter_group.setLayout(meter_layout)
+        
+        # 功率平坦化组
+        flatten_group = QGroupBox("功率平坦化")
+        flatten_layout = QHBoxLayout()
+        
+        self.calibration_label = QLabel("未校准")
+        flatten_layout.addWidget(self.calibration_label)
+        
+        calibrate_btn = QPushButton("功率校准")
+        calibrate_btn.clicked.connect(self.start_power_calibration)
+        calibrate_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.WARNING))
+        flatten_layout.addWidget(calibrate_btn)
+        
+        flat_sweep_btn = QPushButton("平坦化步进扫描")
+        flat_sweep_btn.clicked.connect(self.start_flattened_sweep)
+        flat_sweep_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.SUCCESS))
+        flatten_layout.addWidget(flat_sweep_btn)
+        
+        flatten_group.setLayout(flatten_layout)
+        
         # 扫描状态组
         status_group = QGroupBox("扫描状态")
         status_layout = QHBoxLayout()
@@ -642,6 +831,28 @@ class TSL570GUI(QMainWindow):
         
         status_group.setLayout(status_layout)
         
+        # 多循环平均结果组
+        average_group = QGroupBox("多循环平均")
+        average_layout = QGridLayout()
+        
+        self.average_labels = {}
+        average_items = [
+            ('cycles', '已累加循环:'),
+            ('points', '网格点数:'),
+            ('mean', '平均值:'),
+            ('std', '最大标准差:'),
+            ('range', '数值范围:')
+        ]
+        
+        for i, (key, label) in enumerate(average_items):
+            row = i // 3
+            col = (i % 3) * 2
+            average_layout.addWidget(QLabel(label), row, col)
+            self.average_labels[key] = QLabel("--")
+            average_layout.addWidget(self.average_labels[key], row, col + 1)
+        
+        average_group.setLayout(average_layout)
+        
         # 控制按钮组
         control_group = QGroupBox("扫描控制")
         control_layout = QHBoxLayout()
@@ -667,12 +878,215 @@ class TSL570GUI(QMainWindow):
         # 添加到布局
         layout.addWidget(params_group)
         layout.addWidget(mode_group)
+        layout.addWidget(meter_group)
+        layout.addWidget(flatten_group)
         layout.addWidget(status_group)
+        layout.addWidget(average_group)
         layout.addWidget(control_group)
         layout.addStretch()
         
         return tab
 
+    def create_campaign_tab(self):
+        """创建批量任务选项卡"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        
+        # 参数网格组, 每项可填写多个值, 用逗号分隔
+        grid_group = QGroupBox("参数网格(多个值用逗号分隔)")
+        grid_layout = QGridLayout()
+        
+        self.campaign_inputs = {}
+        campaign_params = [
+            ('range', '波长范围(nm):', '1500-1510, 1540-1560'),
+            ('power', '功率(dBm):', '0, 5'),
+            ('speed', '扫描速度(nm/s):', '10'),
+            ('cycles', '循环次数:', '1')
+        ]
+        
+        for i, (key, label, placeholder) in enumerate(campaign_params):
+            grid_layout.addWidget(QLabel(label), i, 0)
+            self.campaign_inputs[key] = QLineEdit()
+            self.campaign_inputs[key].setPlaceholderText(placeholder)
+            self.campaign_inputs[key].setStyleSheet(StyleSheet.get_line_edit_style())
+            grid_layout.addWidget(self.campaign_inputs[key], i, 1)
+        
+        grid_layout.addWidget(QLabel("步长、驻留时间和扫描模式使用扫频设置中的值"),
+                              len(campaign_params), 0, 1, 2)
+        grid_group.setLayout(grid_layout)
+        
+        # 任务进度组
+        progress_group = QGroupBox("任务进度")
+        progress_layout = QVBoxLayout()
+        self.campaign_progress_label = QLabel("未开始")
+        self.campaign_run_label = QLabel("--")
+        progress_layout.addWidget(self.campaign_progress_label)
+        progress_layout.addWidget(self.campaign_run_label)
+        progress_group.setLayout(progress_layout)
+        
+        # 任务控制组
+        control_group = QGroupBox("任务控制")
+        control_layout = QHBoxLayout()
+        
+        start_btn = QPushButton("开始新任务")
+        start_btn.clicked.connect(self.start_campaign)
+        start_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.SUCCESS))
+        
+        resume_btn = QPushButton("继续上次任务")
+        resume_btn.clicked.connect(self.resume_campaign)
+        resume_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.PRIMARY))
+        
+        stop_btn = QPushButton("停止任务")
+        stop_btn.clicked.connect(self.stop_campaign)
+        stop_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.DANGER))
+        
+        control_layout.addWidget(start_btn)
+        control_layout.addWidget(resume_btn)
+        control_layout.addWidget(stop_btn)
+        control_group.setLayout(control_layout)
+        
+        # 添加到布局
+        layout.addWidget(grid_group)
+        layout.addWidget(progress_group)
+        layout.addWidget(control_group)
+        layout.addStretch()
+        
+        return tab
+
+    def create_analysis_tab(self):
+        """创建谐振分析选项卡"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        
+        # 分析设置组
+        settings_group = QGroupBox("分析设置")
+        settings_layout = QHBoxLayout()
+        
+        settings_layout.addWidget(QLabel("最小凹陷深度(dB):"))
+        self.min_depth_input = QLineEdit("3")
+        self.min_depth_input.setStyleSheet(StyleSheet.get_line_edit_style())
+        settings_layout.addWidget(self.min_depth_input)
+        
+        settings_layout.addWidget(QLabel("平滑点数:"))
+        self.smooth_input = QLineEdit("1")
+        self.smooth_input.setStyleSheet(StyleSheet.get_line_edit_style())
+        settings_layout.addWidget(self.smooth_input)
+        
+        settings_layout.addWidget(QLabel("横轴:"))
+        self.axis_nm = QRadioButton("nm")
+        self.axis_thz = QRadioButton("THz")
+        self.axis_nm.setChecked(True)
+        settings_layout.addWidget(self.axis_nm)
+        settings_layout.addWidget(self.axis_thz)
+        
+        self.auto_analysis_check = QCheckBox("每个循环自动分析")
+        settings_layout.addWidget(self.auto_analysis_check)
+        
+        analyze_btn = QPushButton("分析平均数据")
+        analyze_btn.clicked.connect(self.analyze_average)
+        analyze_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.PRIMARY))
+        settings_layout.addWidget(analyze_btn)
+        
+        clear_btn = QPushButton("清空结果")
+        clear_btn.clicked.connect(self.clear_analysis)
+        clear_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.INFO))
+        settings_layout.addWidget(clear_btn)
+        
+        settings_group.setLayout(settings_layout)
+        
+        # 分析结果组
+        results_group = QGroupBox("谐振分析结果")
+        results_layout = QVBoxLayout()
+        
+        self.resonance_table = QTableWidget(0, 5)
+        self.resonance_table.setHorizontalHeaderLabels(
+            ["数据", "中心波长(nm)", "消光比(dB)", "FWHM(pm)", "Q值"])
+        self.resonance_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.Stretch)
+        self.resonance_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        results_layout.addWidget(self.resonance_table)
+        
+        self.analysis_plot = SpectrumPlot()
+        results_layout.addWidget(self.analysis_plot)
+        
+        results_group.setLayout(results_layout)
+        
+        # 添加到布局
+        layout.addWidget(settings_group)
+        layout.addWidget(results_group)
+        
+        return tab
+
+    def create_history_tab(self):
+        """创建历史记录选项卡"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        
+        # 筛选条件组
+        filter_group = QGroupBox("筛选条件")
+        filter_layout = QHBoxLayout()
+        
+        self.history_inputs = {}
+        history_filters = [
+            ('serial', '序列号:'),
+            ('since', '起始日期:'),
+            ('wavelength', '包含波长(nm):')
+        ]
+        for key, label in history_filters:
+            filter_layout.addWidget(QLabel(label))
+            self.history_inputs[key] = QLineEdit()
+            self.history_inputs[key].setStyleSheet(StyleSheet.get_line_edit_style())
+            filter_layout.addWidget(self.history_inputs[key])
+        self.history_inputs['since'].setPlaceholderText("YYYY-MM-DD")
+        
+        query_btn = QPushButton("查询")
+        query_btn.clicked.connect(self.query_history)
+        query_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.PRIMARY))
+        filter_layout.addWidget(query_btn)
+        
+        self.archive_check = QCheckBox("自动存档扫描数据")
+        self.archive_check.setChecked(False)
+        filter_layout.addWidget(self.archive_check)
+        
+        filter_group.setLayout(filter_layout)
+        
+        # 扫描记录组
+        records_group = QGroupBox("扫描记录")
+        records_layout = QVBoxLayout()
+        
+        self.history_table = QTableWidget(0, 9)
+        self.history_table.setHorizontalHeaderLabels(
+            ["编号", "时间", "序列号", "类型", "范围(nm)", "点数",
+             "平均值", "最小值", "最大值"])
+        self.history_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.Stretch)
+        self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.history_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.history_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        records_layout.addWidget(self.history_table)
+        
+        history_btn_layout = QHBoxLayout()
+        overlay_btn = QPushButton("叠加显示所选")
+        overlay_btn.clicked.connect(self.overlay_history)
+        overlay_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.SUCCESS))
+        clear_btn = QPushButton("清除曲线")
+        clear_btn.clicked.connect(lambda: self.history_plot.clear())
+        clear_btn.setStyleSheet(StyleSheet.get_button_style(ColorScheme.INFO))
+        history_btn_layout.addWidget(overlay_btn)
+        history_btn_layout.addWidget(clear_btn)
+        records_layout.addLayout(history_btn_layout)
+        
+        self.history_plot = SpectrumPlot()
+        records_layout.addWidget(self.history_plot)
+        
+        records_group.setLayout(records_layout)
+        
+        # 添加到布局
+        layout.addWidget(filter_group)
+        layout.addWidget(records_group)
+        
+        return tab
+
     def create_log_area(self):
         """创建日志显示区域"""
         log_group = QGroupBox("操作日志")
@@ -680,6 +1094,7 @@ class TSL570GUI(QMainWindow):
         
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.document().setMaximumBlockCount(self.LOG_MAX_BLOCKS)
         log_layout.addWidget(self.log_text)
         
         self.centralWidget().layout().addWidget(log_group)
@@ -702,6 +1117,25 @@ class TSL570GUI(QMainWindow):
         """)
 
     # 设备控制方法
+    def format_error(self, action, error):
+        """将驱动异常格式化为日志信息"""
+        if isinstance(error, NotConnectedError):
+            return str(error)
+        if isinstance(error, CommandError):
+            return f"{action}失败: 设备错误 {error}"
+        return f"{action}失败: {str(error)}"
+
+    def run_device(self, action, func, *args, done=None):
+        """调用驱动方法, 成功时记录 done, 失败时记录错误信息, 返回是否成功"""
+        try:
+            func(*args)
+        except TSLError as e:
+            self.show_log(self.format_error(action, e))
+            return False
+        if done:
+            self.show_log(done)
+        return True
+
     def connect_device(self):
         devices = self.tsl.search_gpib_addresses()
         if not devices:
@@ -709,46 +1143,55 @@ class TSL570GUI(QMainWindow):
             self.show_log("未找到 GPIB 设备")
             return
             
-        result = self.tsl.connect_device(devices[0])
+        connected = self.run_device("连接设备", self.tsl.connect_device, devices[0])
         if self.tsl.is_connected():
             self.update_status("已连接", True)
             self.update_device_info()
+            self.update_calibration_label()
         else:
             self.update_status("未连接", False)
-        self.show_log(result)
+        if connected:
+            self.show_log(f"成功连接到设备: {devices[0]}")
 
     def disconnect_device(self):
-        result = self.tsl.disconnect()
+        self.run_device("断开连接", self.tsl.disconnect, done="设备已断开连接")
         self.update_status("未连接", False)
-        self.show_log(result)
 
     def shutdown_device(self):
-        result = self.tsl.device_shut_down()
-        self.show_log(result)
+        self.run_device("关闭设备", self.tsl.device_shut_down, done="设备已关闭")
 
     def restart_device(self):
-        result = self.tsl.device_restart()
-        self.show_log(result)
+        self.run_device("重启设备", self.tsl.device_restart, done="设备已重启")
 
     def set_wavelength(self):
         wavelength = self.wavelength_input.text()
         if not wavelength:
             self.show_log("请输入波长值")
             return
-        result = self.tsl.set_wavelength(wavelength)
-        self.show_log(result)
+        self.run_device("设置波长", self.tsl.set_wavelength, wavelength,
+                        done=f"波长已设置为 {wavelength}")
 
     def set_power(self, state):
-        result = self.tsl.set_power_status('1' if state else '0')
-        self.show_log(result)
+        self.run_device("设置输出状态", self.tsl.set_power_status, state,
+                        done="激光器输出已" + ("开启" if state else "关闭"))
 
     def set_power_level(self):
         power = self.power_input.text()
         if not power:
             self.show_log("请输入功率值")
             return
-        result = self.tsl.set_power_level(power)
-        self.show_log(result)
+        self.run_device("设置功率", self.tsl.set_power_level, power,
+                        done=f"输出功率已设置为 {power}")
+
+    # 扫描参数对应的驱动方法、操作名称和成功信息
+    SWEEP_SETTERS = {
+        'start': ('set_sweep_start', "设置起始波长", "扫描起始波长已设置为 {}nm"),
+        'stop': ('set_sweep_stop', "设置结束波长", "扫描结束波长已设置为 {}nm"),
+        'step': ('set_sweep_step', "设置步长", "扫描步长已设置为 {}nm"),
+        'speed': ('set_sweep_speed', "设置扫描速度", "扫描速度已设置为 {}nm/s"),
+        'dwell': ('set_dwell_time', "设置驻留时间", "驻留时间已设置为 {}秒"),
+        'cycles': ('set_sweep_cycles', "设置循环次数", "扫描循环次数已设置为 {}次")
+    }
 
     def setup_sweep(self):
         if not self.tsl.is_connected():
@@ -758,48 +1201,119 @@ class TSL570GUI(QMainWindow):
         # 获取扫描模式
         sweep_type = "STEP" if self.sweep_type_step.isChecked() else "CONTINUOUS"
         sweep_direction = "ONE_WAY" if self.sweep_direction_one.isChecked() else "TWO_WAY"
-        mode = f"{sweep_type}_{sweep_direction}"
+        mode = SweepMode[f"{sweep_type}_{sweep_direction}"]
+        
+        # 之前遗留的错误不算作本次设置的错误
+        self.run_device("清空错误队列", self.tsl.clear_errors)
         
         # 设置扫描模式
-        result = self.tsl.set_sweep_mode(mode)
-        self.show_log(result)
+        self.run_device("设置扫描模式", self.tsl.set_sweep_mode, mode,
+                        done=f"扫描模式已设置为 {mode.name}")
         
         # 设置其他参数
         for key, input_widget in self.sweep_inputs.items():
             value = input_widget.text()
             if value:
-                if key == 'start':
-                    self.show_log(self.tsl.set_sweep_start(value))
-                elif key == 'stop':
-                    self.show_log(self.tsl.set_sweep_stop(value))
-                elif key == 'step':
-                    self.show_log(self.tsl.set_sweep_step(value))
-                elif key == 'speed':
-                    self.show_log(self.tsl.set_sweep_speed(value))
-                elif key == 'dwell':
-                    self.show_log(self.tsl.set_dwell_time(value))
-                elif key == 'cycles':
-                    self.show_log(self.tsl.set_sweep_cycles(value))
+                method, action, done = self.SWEEP_SETTERS[key]
+                self.run_device(action, getattr(self.tsl, method), value,
+                                done=done.format(value))
+        
+        self.setup_acquisition()
+        self.sweep_params = self._current_sweep_params()
+        
+        # 参数全部发送后统一检查一次设备错误队列
+        self.run_device("设置扫描参数", self.tsl.check_errors)
+        
+        # 按扫描范围建立多循环平均的公共波长网格
+        try:
+            if self.acquisition is not None:
+                self.sweep_accumulator = SweepAccumulator(self.acquisition.grid)
+            else:
+                self.sweep_accumulator = SweepAccumulator.from_range(
+                    self.sweep_inputs['start'].text(),
+                    self.sweep_inputs['stop'].text(),
+                    self.sweep_inputs['step'].text())
+        except ValueError:
+            self.sweep_accumulator = None
+            self.show_log("扫描范围或步长未设置，多循环平均不可用")
+        self.publish_average()
         
         self.sweep_status_label.setText("已设置参数，等待开始")
         self.show_log("扫描参数已全部设置")
 
+    def _current_sweep_params(self):
+        """记录当前扫描参数, 随扫描数据一起存档"""
+        def number(text):
+            try:
+                return float(text)
+            except ValueError:
+                return None
+        
+        sweep_type = "STEP" if self.sweep_type_step.isChecked() else "CONTINUOUS"
+        sweep_direction = "ONE_WAY" if self.sweep_direction_one.isChecked() else "TWO_WAY"
+        return {
+            'mode': f"{sweep_type}_{sweep_direction}",
+            'start_nm': number(self.sweep_inputs['start'].text()),
+            'stop_nm': number(self.sweep_inputs['stop'].text()),
+            'step_nm': number(self.sweep_inputs['step'].text()),
+            'speed': number(self.sweep_inputs['speed'].text()),
+            'dwell': number(self.sweep_inputs['dwell'].text()),
+            'cycles': number(self.sweep_inputs['cycles'].text()),
+            'power': number(self.power_input.text()),
+            'trigger_step': (number(self.trigger_step_input.text())
+                             if self.acquisition is not None else None)
+        }
+
+    def setup_acquisition(self):
+        """配置激光器触发输出与功率计同步采集"""
+        self.acquisition = None
+        if not self.meter_simulated.isChecked():
+            return
+        if not self.simulated:
+            self.show_log("没有可用的功率计，同步采集仅支持模拟设备(--simulate)")
+            return
+        
+        # 未填写触发步长时使用扫描步长
+        trigger_step = (self.trigger_step_input.text()
+                        or self.sweep_inputs['step'].text())
+        acquisition = SweepAcquisition(self.tsl, SimulatedPowerMeter())
+        try:
+            acquisition.configure(
+                self.sweep_inputs['start'].text(),
+                self.sweep_inputs['stop'].text(),
+                trigger_step)
+        except ValueError:
+            self.show_log("扫描范围或触发步长未设置，无法进行同步采集")
+            return
+        except TSLError as e:
+            self.show_log(self.format_error("配置同步采集", e))
+            return
+        self.acquisition = acquisition
+        self.show_log(f"同步采集已配置: 触发步长 {trigger_step}nm, "
+                      f"{acquisition.grid.size} 个点")
+
     def start_sweep(self):
         if not self.tsl.is_connected():
             self.show_log("设备未连接，无法开始扫描")
             return
             
-        # 先尝试重复扫描
-        result = self.tsl.sweep_repeat()
-        if "失败" in result:
-            # 如果重复扫描失败，则尝试开始新的扫描
-            result = self.tsl.start_sweep()
-            
-        if "失败" not in result:
-            self.sweep_status_label.setText("扫描中...")
-            self.sweep_count_label.setText("扫描次数: 0")
-            self._start_count_update()
+        # 先尝试重复扫描, 失败时开始新的扫描
+        try:
+            self.tsl.sweep_repeat()
+            result = "扫描已重复启动"
+        except TSLError:
+            if not self.run_device("开始扫描", self.tsl.start_sweep):
+                return
+            result = "扫描已开始"
             
+        self.sweep_running = True
+        self.sweep_status_label.setText("扫描中...")
+        self.sweep_count_label.setText("扫描次数: 0")
+        self._last_cycle_count = 0
+        if self.sweep_accumulator is not None:
+            self.sweep_accumulator.reset()
+            self.publish_average()
+        self._start_count_update()
         self.show_log(result)
 
     def stop_sweep(self):
@@ -807,31 +1321,515 @@ class TSL570GUI(QMainWindow):
             self.show_log("设备未连接，无法停止扫描")
             return
             
-        result = self.tsl.stop_sweep()
-        if "失败" not in result:
+        if self.step_task is not None:
+            self.step_timer.stop()
+            self.step_task = None
+            self.show_log("步进任务已停止")
+        
+        if self.run_device("停止扫描", self.tsl.stop_sweep, done="扫描已停止"):
+            self.sweep_running = False
+            self.count_timer.stop()
             self.sweep_status_label.setText("已停止")
-            
-        self.show_log(result)
+
+    def _sweep_wavelengths(self):
+        """按扫描参数生成步进扫描的波长点, 参数无效时返回None"""
+        try:
+            start = float(self.sweep_inputs['start'].text())
+            stop = float(self.sweep_inputs['stop'].text())
+            step = abs(float(self.sweep_inputs['step'].text()))
+        except ValueError:
+            return None
+        if step == 0 or start == stop:
+            return None
+        points = int(np.floor(abs(stop - start) / step + 1e-9)) + 1
+        return start + np.sign(stop - start) * step * np.arange(points)
+
+    def _dwell_interval(self):
+        """步进任务的每点间隔(毫秒), 默认0.1秒"""
+        try:
+            return max(int(float(self.sweep_inputs['dwell'].text()) * 1000), 1)
+        except ValueError:
+            return 100
+
+    def start_power_calibration(self):
+        """在扫描范围内测量当前设备的功率-波长响应"""
+        if not self.tsl.is_connected():
+            self.show_log("设备未连接，无法进行功率校准")
+            return
+        if not self.simulated:
+            self.show_log("没有可用的功率计，功率校准仅支持模拟设备(--simulate)")
+            return
+        if not self.meter_simulated.isChecked():
+            self.show_log("请先选择用于功率校准的功率计")
+            return
+        wavelengths = self._sweep_wavelengths()
+        power = self.power_input.text()
+        if wavelengths is None or not power:
+            self.show_log("请先设置扫描范围、步长和功率值")
+            return
+        
+        # 功率计直连激光器输出
+        source = SimulatedPowerMeter(transmission=SimulatedPowerMeter.output_ripple,
+                                     power=float(power))
+        task = CalibrationRun(self.tsl, source, self.tsl.device_info["serial"],
+                              wavelengths, power)
+        self.start_step_task(task, "功率校准中...")
+
+    def start_flattened_sweep(self):
+        """使用当前设备的校准数据进行功率平坦化的步进扫描"""
+        if not self.tsl.is_connected():
+            self.show_log("设备未连接，无法开始扫描")
+            return
+        try:
+            calibration = self.calibration_store.load(self.tsl.device_info["serial"])
+        except (OSError, ValueError, KeyError) as e:
+            self.show_log(f"读取功率校准数据失败: {str(e)}")
+            return
+        if calibration is None:
+            self.show_log("当前设备没有功率校准数据，请先进行功率校准")
+            return
+        wavelengths = self._sweep_wavelengths()
+        if wavelengths is None:
+            self.show_log("请先设置扫描范围和步长")
+            return
+        
+        # 查找表在扫描开始前一次算好, 扫描时每点只发送一条命令
+        try:
+            target = float(self.power_input.text()) if self.power_input.text() else None
+        except ValueError:
+            self.show_log("功率值无效")
+            return
+        setpoints = calibration.build_lut(wavelengths, target)
+        try:
+            max_power = float(self.tsl.device_info["max_power"])
+        except ValueError:
+            max_power = None
+        if max_power is not None and np.any(setpoints > max_power):
+            self.show_log(f"部分波长点的功率设置超过设备上限 {max_power}dBm，已截断")
+            setpoints = calibration.build_lut(wavelengths, target, (-np.inf, max_power))
+        self.start_step_task(SteppedSweep(self.tsl, wavelengths, setpoints),
+                             "步进扫描中...")
+
+    def start_step_task(self, task, status):
+        """启动由定时器驱动的逐点任务"""
+        self.step_timer.stop()
+        try:
+            task.start()
+        except TSLError as e:
+            self.show_log(self.format_error("启动步进任务", e))
+            return
+        self.step_task = task
+        self.show_log(task.description)
+        self.sweep_status_label.setText(status)
+        self.step_timer.start(self._dwell_interval())
+
+    def advance_step_task(self):
+        """执行逐点任务的下一步"""
+        task = self.step_task
+        if task is None:
+            self.step_timer.stop()
+            return
+        try:
+            running = task.step()
+        except Exception as e:
+            self.step_timer.stop()
+            self.step_task = None
+            self.sweep_status_label.setText("已停止")
+            self.show_log(self.format_error("步进任务", e))
+            return
+        if running:
+            return
+        
+        self.step_timer.stop()
+        self.step_task = None
+        self.sweep_status_label.setText("已完成")
+        if isinstance(task, CalibrationRun):
+            calibration = task.result()
+            try:
+                self.calibration_store.save(calibration)
+            except (OSError, ValueError) as e:
+                self.show_log(f"保存功率校准数据失败: {str(e)}")
+                return
+            self.update_calibration_label(calibration)
+            self.show_log(f"功率校准完成，已保存设备 {calibration.serial} 的校准数据")
+        else:
+            self.show_log("平坦化步进扫描完成")
+
+    def update_calibration_label(self, calibration=None):
+        """显示当前设备的校准状态"""
+        if calibration is None:
+            try:
+                calibration = self.calibration_store.load(self.tsl.device_info["serial"])
+            except (OSError, ValueError, KeyError) as e:
+                self.calibration_label.setText("校准数据无法读取")
+                self.show_log(f"读取功率校准数据失败: {str(e)}")
+                return
+        if calibration is None:
+            self.calibration_label.setText("未校准")
+            return
+        ripple = np.ptp(calibration.power)
+        self.calibration_label.setText(
+            f"已校准 {calibration.wavelength[0]:.1f}~{calibration.wavelength[-1]:.1f}nm, "
+            f"起伏 {ripple:.2f}dB")
+
+    def _campaign_axes(self):
+        """解析批量任务的参数网格, 按切换代价从高到低排列"""
+        def values(key):
+            text = self.campaign_inputs[key].text().replace("，", ",")
+            return [v.strip() for v in text.split(",") if v.strip()]
+        
+        ranges = []
+        for text in values('range'):
+            start, _, stop = text.replace("~", "-").partition("-")
+            if not stop:
+                raise ValueError(f"波长范围格式错误: {text}")
+            ranges.append({'start': float(start), 'stop': float(stop)})
+        
+        # 波长范围需要两条命令, 功率切换后需要稳定, 放在外层变化最少
+        return [
+            ('range', ranges),
+            ('power', [float(v) for v in values('power')]),
+            ('speed', [float(v) for v in values('speed')]),
+            ('cycles', [int(v) for v in values('cycles')])
+        ]
+
+    def _campaign_fixed_settings(self):
+        """所有批量任务共用的扫频设置"""
+        sweep_type = "STEP" if self.sweep_type_step.isChecked() else "CONTINUOUS"
+        sweep_direction = "ONE_WAY" if self.sweep_direction_one.isChecked() else "TWO_WAY"
+        fixed = {'mode': f"{sweep_type}_{sweep_direction}"}
+        for key in ('step', 'dwell'):
+            if self.sweep_inputs[key].text():
+                fixed[key] = self.sweep_inputs[key].text()
+        return fixed
+
+    def start_campaign(self):
+        """展开参数网格并开始新的批量任务"""
+        if not self.tsl.is_connected():
+            self.show_log("设备未连接，无法开始批量任务")
+            return
+        try:
+            runs = expand_grid(self._campaign_axes(), self._campaign_fixed_settings())
+        except ValueError as e:
+            self.show_log(f"参数网格无效: {str(e)}")
+            return
+        campaign = Campaign(CAMPAIGN_FILE, runs)
+        try:
+            campaign.save()
+        except OSError as e:
+            self.show_log(f"无法写入检查点文件: {str(e)}")
+            return
+        self.show_log(f"批量任务共 {len(runs)} 个，检查点文件: {CAMPAIGN_FILE}")
+        self.run_campaign(campaign)
+
+    def resume_campaign(self):
+        """从检查点文件继续上次未完成的批量任务"""
+        if not self.tsl.is_connected():
+            self.show_log("设备未连接，无法继续批量任务")
+            return
+        try:
+            campaign = Campaign.load(CAMPAIGN_FILE)
+        except (OSError, ValueError, KeyError) as e:
+            self.show_log(f"读取检查点失败: {str(e)}")
+            return
+        if campaign.is_finished():
+            self.show_log("上次的批量任务已全部完成")
+            return
+        self.show_log(f"从第 {campaign.next_index() + 1} 个任务继续，"
+                      f"已完成 {len(campaign.completed)}/{len(campaign.runs)}")
+        self.run_campaign(campaign)
+
+    def run_campaign(self, campaign):
+        """启动批量任务的轮询"""
+        self.campaign_runner = CampaignRunner(self.tsl, campaign)
+        self.update_campaign_progress()
+        self.advance_campaign()
+        if self.campaign_runner is not None:
+            self.campaign_timer.start(500)
+
+    def stop_campaign(self):
+        """停止批量任务, 当前任务在续跑时重新执行"""
+        if self.campaign_runner is None:
+            self.show_log("没有正在运行的批量任务")
+            return
+        self.campaign_timer.stop()
+        self.campaign_runner = None
+        self.run_device("停止扫描", self.tsl.stop_sweep)
+        self.campaign_progress_label.setText("已停止，可继续上次任务")
+        self.show_log("批量任务已停止")
+
+    def advance_campaign(self):
+        """批量任务轮询: 设置并启动下一个任务或检查当前任务是否完成"""
+        runner = self.campaign_runner
+        if runner is None:
+            self.campaign_timer.stop()
+            return
+        try:
+            event, index = runner.poll()
+        except (TSLError, OSError, KeyError, ValueError) as e:
+            self.campaign_timer.stop()
+            self.campaign_runner = None
+            self.campaign_progress_label.setText("出错停止，可继续上次任务")
+            self.show_log(self.format_error("批量任务", e))
+            return
+        
+        if event == 'started':
+            self.campaign_run_label.setText(
+                f"当前任务 {index + 1}: {self.describe_run(runner.campaign.runs[index])}")
+        elif event == 'finished':
+            self.update_campaign_progress()
+            self.show_log(f"批量任务 {index + 1} 已完成")
+            self.advance_campaign()
+        elif event == 'done':
+            self.campaign_timer.stop()
+            self.campaign_runner = None
+            self.campaign_run_label.setText("--")
+            self.show_log("批量任务全部完成")
+
+    def update_campaign_progress(self):
+        campaign = self.campaign_runner.campaign
+        self.campaign_progress_label.setText(
+            f"进度: {len(campaign.completed)}/{len(campaign.runs)}")
+
+    @staticmethod
+    def describe_run(run):
+        """批量任务参数的简要说明"""
+        parts = []
+        if 'start' in run:
+            parts.append(f"{run['start']}-{run['stop']}nm")
+        if 'power' in run:
+            parts.append(f"{run['power']}dBm")
+        if 'speed' in run:
+            parts.append(f"{run['speed']}nm/s")
+        if 'cycles' in run:
+            parts.append(f"{run['cycles']}次")
+        return ", ".join(parts)
 
     def _start_count_update(self):
         """启动自动更新扫描次数"""
-        if hasattr(self, 'count_timer'):
-            self.count_timer.stop()
-            
-        self.count_timer = QTimer()
-        self.count_timer.timeout.connect(self.update_sweep_count)
         self.count_timer.start(1000)  # 每秒更新一次
 
     def update_sweep_count(self):
         """更新扫描次数"""
-        if self.tsl.is_connected() and "扫描中" in self.sweep_status_label.text():
+        if not (self.sweep_running and self.tsl.is_connected()):
+            return
+        try:
+            count = self.tsl.read_sweep_count()
+        except (TSLError, ValueError):
+            return
+        self.sweep_count_label.setText(f"扫描次数: {count}")
+        self.collect_sweep_cycle(count)
+
+    def collect_sweep_cycle(self, count):
+        """扫描次数增加时读取最近一次循环的数据并累加"""
+        if self.sweep_accumulator is None or count <= self._last_cycle_count:
+            return
+        skipped = count - self._last_cycle_count - 1
+        self._last_cycle_count = count
+        
+        try:
+            if self.acquisition is not None:
+                data = self.acquisition.collect()
+            else:
+                data = self.tsl.read_sweep_data()
+        except (TSLError, ValueError) as e:
+            self.show_log(self.format_error("读取扫描数据", e))
+            return
+        if skipped > 0:
+            self.show_log(f"轮询间隔内完成了多个循环，{skipped}个循环未参与平均")
+        if self.archive_check.isChecked():
+            self.archive_sweep(data, count)
+        try:
+            self.sweep_accumulator.add_cycle(*data)
+        except ValueError as e:
+            self.show_log(f"累加扫描数据失败: {str(e)}")
+            return
+        self.publish_average()
+        
+        if self.auto_analysis_check.isChecked():
+            self.submit_analysis(f"循环 {count}", *data)
+
+    def open_archive(self):
+        """打开扫描存档, 失败时记录日志并返回None
+
+        程序目录不可写(如安装在只读目录)时不影响其他功能
+        """
+        if self.archive is None:
             try:
-                result = self.tsl.read_sweep_count()
-                if "失败" not in result and ":" in result:
-                    count = result.split(":")[-1].strip()
-                    self.sweep_count_label.setText(f"扫描次数: {count}")
-            except Exception:
-                pass
+                self.archive = SweepArchive(ARCHIVE_DIR)
+            except (OSError, sqlite3.Error) as e:
+                self.show_log(f"无法打开扫描存档 {ARCHIVE_DIR}: {str(e)}")
+        return self.archive
+
+    def archive_sweep(self, data, count):
+        """将一次循环的数据存档并写入索引"""
+        archive = self.open_archive()
+        if archive is None:
+            # 避免每个循环重复报错
+            self.archive_check.setChecked(False)
+            return
+        params = dict(self.sweep_params, cycle=count)
+        kind = "transmission" if self.acquisition is not None else "power"
+        try:
+            archive.save_sweep(data[0], data[1], params,
+                               self.tsl.device_info["serial"],
+                               self.tsl.device_info["model"], kind)
+        except (OSError, sqlite3.Error) as e:
+            self.show_log(f"存档扫描数据失败: {str(e)}")
+
+    def query_history(self):
+        """按筛选条件查询扫描记录"""
+        archive = self.open_archive()
+        if archive is None:
+            return
+        wavelength = self.history_inputs['wavelength'].text()
+        try:
+            rows = archive.query(
+                serial=self.history_inputs['serial'].text().strip() or None,
+                since=self.history_inputs['since'].text().strip() or None,
+                wavelength=float(wavelength) if wavelength else None)
+        except ValueError:
+            self.show_log("包含波长无效")
+            return
+        except sqlite3.Error as e:
+            self.show_log(f"查询扫描记录失败: {str(e)}")
+            return
+        
+        def fmt(value, spec):
+            return "--" if value is None else format(value, spec)
+        
+        table = self.history_table
+        table.setUpdatesEnabled(False)
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            values = [str(row['id']), row['created_at'], row['serial'] or "",
+                      row['kind'] or "",
+                      f"{fmt(row['start_nm'], '.3f')}-{fmt(row['stop_nm'], '.3f')}",
+                      str(row['points']), fmt(row['y_mean'], '.3f'),
+                      fmt(row['y_min'], '.3f'), fmt(row['y_max'], '.3f')]
+            for col, value in enumerate(values):
+                table.setItem(i, col, QTableWidgetItem(value))
+        table.setUpdatesEnabled(True)
+        self.show_log(f"找到 {len(rows)} 条扫描记录")
+
+    def overlay_history(self):
+        """读取所选记录的数据并叠加显示"""
+        rows = sorted({index.row() for index in self.history_table.selectedIndexes()})
+        if not rows:
+            self.show_log("请先选择要显示的扫描记录")
+            return
+        
+        archive = self.open_archive()
+        if archive is None:
+            return
+        
+        # 按控件宽度抽稀, 每条曲线只读取一次数据文件
+        max_points = max(self.history_plot.width() * 2, 200)
+        curves = []
+        for row in rows[:len(SpectrumPlot.COLORS)]:
+            sweep_id = int(self.history_table.item(row, 0).text())
+            try:
+                wavelength, values = archive.load(sweep_id, max_points)
+            except (OSError, KeyError) as e:
+                self.show_log(f"读取扫描数据失败: {str(e)}")
+                continue
+            curves.append((f"#{sweep_id}", wavelength, values))
+        self.history_plot.set_curves(curves)
+
+    def publish_average(self):
+        """将多循环平均结果显示到界面"""
+        acc = self.sweep_accumulator
+        if acc is None or not acc.count.any():
+            for label in self.average_labels.values():
+                label.setText("--")
+            if acc is not None:
+                self.average_labels['cycles'].setText(str(acc.cycles))
+                self.average_labels['points'].setText(f"0/{acc.grid.size}")
+            return
+        
+        covered = acc.count > 0
+        mean = acc.mean[covered]
+        std = acc.std[covered]
+        self.average_labels['cycles'].setText(str(acc.cycles))
+        self.average_labels['points'].setText(f"{int(covered.sum())}/{acc.grid.size}")
+        self.average_labels['mean'].setText(f"{mean.mean():.3f}")
+        self.average_labels['std'].setText(
+            f"{np.nanmax(std):.4f}" if acc.cycles > 1 else "--")
+        self.average_labels['range'].setText(
+            f"{acc.minimum[covered].min():.3f} ~ {acc.maximum[covered].max():.3f}")
+
+    def analyze_average(self):
+        """分析多循环平均后的数据"""
+        acc = self.sweep_accumulator
+        if acc is None or not acc.count.any():
+            self.show_log("没有可分析的平均数据")
+            return
+        self.submit_analysis(f"平均({acc.cycles}次)", acc.grid, acc.mean)
+
+    def submit_analysis(self, label, wavelength, transmission):
+        """将一次扫描数据提交到后处理流水线(滤波、谐振分析、单位换算)"""
+        try:
+            min_depth = float(self.min_depth_input.text())
+            smooth = int(self.smooth_input.text())
+        except ValueError:
+            self.show_log("最小凹陷深度或平滑点数无效")
+            return
+        unit = "THz" if self.axis_thz.isChecked() else "nm"
+        try:
+            job = self.pipeline.submit(label, wavelength, transmission, unit,
+                                       smooth, min_depth)
+        except (ValueError, OSError, PipelineError) as e:
+            self.show_log(f"提交谐振分析失败: {str(e)}")
+            return
+        if job is None:
+            self.show_log(f"分析任务过多, 跳过{label}")
+            return
+        if not self.pipeline_timer.isActive():
+            self.pipeline_timer.start(50)
+
+    def poll_pipeline(self):
+        """取回流水线已完成的结果, 每次只处理少量结果以免界面卡顿"""
+        max_points = max(self.analysis_plot.width() * 2, 200)
+        results = self.pipeline.poll(max_points, limit=4)
+        for label, unit, axis, values, resonances, error in results:
+            if error is not None:
+                self.show_log(f"{label}谐振分析失败: {error}")
+                continue
+            self.show_analysis_result(label, resonances)
+        if results:
+            label, unit, axis, values = results[-1][:4]
+            self.analysis_plot.set_curves([(label, axis, values)], unit)
+        if not self.pipeline.pending:
+            self.pipeline_timer.stop()
+
+    def show_analysis_result(self, label, resonances):
+        """将谐振分析结果追加到结果表格"""
+        table = self.resonance_table
+        row = table.rowCount()
+        table.setUpdatesEnabled(False)
+        table.setRowCount(row + len(resonances))
+        for i, res in enumerate(resonances):
+            values = [label, f"{res['wavelength']:.4f}",
+                      f"{res['extinction_db']:.2f}",
+                      f"{res['fwhm'] * 1000:.2f}", f"{res['q']:.0f}"]
+            for col, value in enumerate(values):
+                table.setItem(row + i, col, QTableWidgetItem(value))
+        table.setUpdatesEnabled(True)
+        table.scrollToBottom()
+        self.show_log(f"{label}: 找到 {len(resonances)} 个谐振")
+
+    def clear_analysis(self):
+        self.resonance_table.setRowCount(0)
+        self.analysis_plot.clear()
+
+    def closeEvent(self, event):
+        """关闭窗口时停止批量任务和后台分析进程"""
+        self.campaign_timer.stop()
+        self.pipeline_timer.stop()
+        self.pipeline.close()
+        if self.archive is not None:
+            self.archive.close()
+        super().closeEvent(event)
 
     def update_status(self, text, connected):
         """更新状态栏显示"""
@@ -859,7 +1857,6 @@ class TSL570GUI(QMainWindow):
     def update_device_info(self):
         """更新设备信息显示"""
         if self.tsl.is_connected():
-            self.tsl.get_device_info()
             device_info = self.tsl.device_info
             self.show_log(f"已读取设备信息:\n型号: {device_info['model']}\n"
                          f"波长范围: {device_info['wavelength_range']}\n"
@@ -867,12 +1864,12 @@ class TSL570GUI(QMainWindow):
 
     def refresh_device_info(self):
         """刷新设备信息"""
-        if self.tsl.is_connected():
-            result = self.tsl.get_device_info()
-            self.update_device_info()
-            self.show_log(result)
-        else:
+        if not self.tsl.is_connected():
             self.show_log("设备未连接，无法获取信息")
+            return
+        if self.run_device("读取设备信息", self.tsl.get_device_info):
+            self.update_device_info()
+            self.show_log("设备信息已更新")
 
     def refresh_optical_status(self):
         """刷新光学参数状态"""
@@ -881,33 +1878,57 @@ class TSL570GUI(QMainWindow):
             return
             
         try:
-            # 获取当前波长
-            self.tsl.device.write(":WAVelength?")
-            wavelength = self.tsl.device.read()
-            self.status_labels['current_wavelength'].setText(f"{wavelength} nm")
-            
-            # 获取当前功率
-            self.tsl.device.write(":POWer?")
-            power = self.tsl.device.read()
-            self.status_labels['current_power'].setText(f"{power} dBm")
+            wavelength = self.tsl.read_wavelength()
+            power = self.tsl.read_power()
+            output_on = self.tsl.read_power_status()
+        except (TSLError, ValueError) as e:
+            self.show_log(self.format_error("获取参数状态", e))
+            return
             
-            # 获取输出状态
-            self.tsl.device.write(":POWer:STATe?")
-            output_state = self.tsl.device.read()
-            if output_state == "1" or output_state.strip() == "1":
-                self.status_labels['output_status'].setText("开启")
-            else:
-                self.status_labels['output_status'].setText("关闭")
-                
-            self.show_log("参数状态已刷新")
-        except Exception as e:
-            self.show_log(f"获取参数状态失败: {str(e)}")
+        self.status_labels['current_wavelength'].setText(f"{wavelength:.4f} nm")
+        self.status_labels['current_power'].setText(f"{power:.2f} dBm")
+        self.status_labels['output_status'].setText("开启" if output_on else "关闭")
+        self.show_log("参数状态已刷新")
+
+def parse_args(argv):
+    """解析命令行参数, 其余参数交给Qt处理"""
+    parser = argparse.ArgumentParser(description="TSL激光器控制程序")
+    parser.add_argument("--profile", action="store_true",
+                        help="记录界面事件循环延迟和卡顿")
+    parser.add_argument("--profile-output", default="profile_report.json",
+                        help="性能分析报告文件")
+    parser.add_argument("--stall-ms", type=float, default=100,
+                        help="判定为卡顿的事件循环延迟(毫秒)")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="同时记录cProfile统计")
+    parser.add_argument("--sample", action="store_true",
+                        help="同时采样界面线程调用栈")
+    parser.add_argument("--simulate", action="store_true",
+                        help="连接模拟激光器, 无需硬件")
+    return parser.parse_known_args(argv[1:])
 
 def main():
-    app = QApplication(sys.argv)
-    window = TSL570GUI()
+    args, qt_args = parse_args(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    resource_manager = None
+    if args.simulate:
+        from simulator import SimulatedResourceManager
+        resource_manager = SimulatedResourceManager()
+    window = TSL570GUI(resource_manager=resource_manager)
+    
+    session = None
+    if args.profile:
+        from profiling import ProfileSession
+        session = ProfileSession(args.profile_output, args.stall_ms,
+                                 args.cprofile, args.sample)
+        window.tsl.tracer = session.tracer
+        session.start()
+    
     window.show()
-    sys.exit(app.exec_())
+    code = app.exec_()
+    if session is not None:
+        print(f"性能分析报告已保存到 {session.finish()}")
+    sys.exit(code)
 
 if __name__ == "__main__":
     main()
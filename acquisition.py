@@ -0,0 +1,119 @@
+"""激光器与功率计的触发同步采集"""
+import numpy as np
+
+
+def trigger_wavelengths(start, stop, step):
+    """按触发输出步长计算每个触发点对应的波长(nm)"""
+    start, stop, step = float(start), float(stop), abs(float(step))
+    if step == 0 or stop == start:
+        raise ValueError("扫描范围或触发步长无效")
+    points = int(np.floor(abs(stop - start) / step + 1e-9)) + 1
+    return start + np.sign(stop - start) * step * np.arange(points)
+
+
+def align_samples(laser_wavelength, laser_power, meter_power):
+    """按触发序号对齐激光器记录数据与功率计采样
+
+    两台仪器在同一触发信号上记录, 第k个采样对应第k个波长。
+    点数不一致时(如功率计漏触发)截断到较短的一方。
+    """
+    laser_wavelength = np.asarray(laser_wavelength, dtype=np.float64).ravel()
+    laser_power = np.asarray(laser_power, dtype=np.float64).ravel()
+    meter_power = np.asarray(meter_power, dtype=np.float64).ravel()
+    n = min(laser_wavelength.size, laser_power.size, meter_power.size)
+    return laser_wavelength[:n], laser_power[:n], meter_power[:n]
+
+
+def resample_uniform(wavelength, values, grid):
+    """将数据插值到统一的波长网格上, 网格外为NaN"""
+    wavelength = np.asarray(wavelength, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(wavelength, kind="stable")
+    return np.interp(grid, wavelength[order], values[order],
+                     left=np.nan, right=np.nan)
+
+
+class SimulatedPowerMeter:
+    """本地模拟功率计
+
+    arm() 时按触发波长生成一组采样, read_logged() 返回记录的功率(dBm)。
+    真实功率计只需提供相同的 arm(wavelengths) / read_logged() 接口。
+    """
+
+    def __init__(self, transmission=None, power=0.0, noise=0.01, seed=None):
+        self.transmission = transmission or self.ring_transmission
+        self.power = power
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self._logged = np.empty(0)
+
+    @staticmethod
+    def output_ripple(wavelength):
+        """激光器直连功率计时的模型: 输出功率随波长缓慢起伏(dB)"""
+        return 0.8 * np.sin(2 * np.pi * (np.asarray(wavelength) - 1500.0) / 37.0)
+
+    @staticmethod
+    def ring_transmission(wavelength):
+        """默认模型: 自由光谱范围0.8nm的微环谐振, 返回透过率(dB)"""
+        fsr, fwhm, depth = 0.8, 0.02, 0.95
+        detune = (np.asarray(wavelength) - 1550.0) % fsr
+        detune = np.minimum(detune, fsr - detune)
+        linear = 1.0 - depth / (1.0 + (2.0 * detune / fwhm) ** 2)
+        return 10.0 * np.log10(linear)
+
+    def arm(self, wavelengths):
+        """准备记录, 每个触发点记录一个采样"""
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self._logged = (self.power + self.transmission(wavelengths)
+                        + self.rng.normal(0.0, self.noise, wavelengths.size))
+
+    def read_logged(self):
+        """读取记录的功率采样(dBm)"""
+        return self._logged.copy()
+
+    def read_power(self, wavelength):
+        """读取单次功率(dBm), 波长用于功率计的波长修正"""
+        return float(self.power + self.transmission(wavelength)
+                     + self.rng.normal(0.0, self.noise))
+
+
+class SweepAcquisition:
+    """触发同步的插入损耗测量
+
+    配置激光器在每个触发步长输出触发信号, 扫描结束后读取激光器记录的
+    波长/输出功率和功率计的采样, 按触发序号对齐后插值到统一网格,
+    得到每次扫描的透过谱(dB)。
+    """
+
+    def __init__(self, tsl, meter):
+        self.tsl = tsl
+        self.meter = meter
+        self.grid = None
+        self._wavelengths = None
+
+    def configure(self, start, stop, trigger_step):
+        """设置触发输出并准备功率计"""
+        wavelengths = trigger_wavelengths(start, stop, trigger_step)
+        self.tsl.set_trigger_output('STEP')
+        self.tsl.set_trigger_step(trigger_step)
+        self.meter.arm(wavelengths)
+        self._wavelengths = wavelengths
+        self.grid = np.sort(wavelengths)
+
+    def collect(self):
+        """读取一次扫描的数据, 返回 (波长网格, 透过率dB)
+
+        数据无效时抛出 ValueError, 读取激光器数据失败时抛出驱动异常
+        """
+        if self.grid is None:
+            raise ValueError("采集未配置")
+        data = self.tsl.read_sweep_data()
+        wavelength, laser_power, meter_power = align_samples(
+            data[0], data[1], self.meter.read_logged())
+        # 功率计每次扫描前需要重新准备记录
+        self.meter.arm(self._wavelengths)
+        if wavelength.size < 2:
+            raise ValueError("采集数据点数不足")
+        transmission = resample_uniform(wavelength, meter_power - laser_power,
+                                        self.grid)
+        return self.grid, transmission
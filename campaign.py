@@ -0,0 +1,148 @@
+"""批量扫描任务(参数网格)及断点续跑"""
+import json
+import os
+from datetime import datetime
+
+# 每项扫描设置对应的驱动方法
+SETTERS = {
+    'mode': 'set_sweep_mode',
+    'start': 'set_sweep_start',
+    'stop': 'set_sweep_stop',
+    'step': 'set_sweep_step',
+    'dwell': 'set_dwell_time',
+    'power': 'set_power_level',
+    'speed': 'set_sweep_speed',
+    'cycles': 'set_sweep_cycles',
+}
+
+
+def gray_order(sizes):
+    """按反射格雷码顺序生成多维索引, 相邻两组索引只有一维不同
+
+    sizes[0] 为最外层, 变化最少; 最后一维变化最多。
+    """
+    order = [()]
+    for size in reversed(sizes):
+        order = [(i,) + rest
+                 for i in range(size)
+                 for rest in (order if i % 2 == 0 else order[::-1])]
+    return order
+
+
+def expand_grid(axes, fixed=None):
+    """将参数网格展开为按格雷码排列的任务列表
+
+    axes 为 [(名称, 取值列表), ...], 取值可以是单个数值, 也可以是
+    同时修改多项设置的字典(如 {'start': 1500, 'stop': 1510})。
+    相邻任务只有一个参数不同, 切换任务时需要发送的命令最少。
+    fixed 为所有任务共用的设置。
+    """
+    axes = [(name, values) for name, values in axes if values]
+    runs = []
+    for index in gray_order([len(values) for _, values in axes]):
+        run = dict(fixed or {})
+        for (name, values), i in zip(axes, index):
+            value = values[i]
+            run.update(value if isinstance(value, dict) else {name: value})
+        runs.append(run)
+    return runs
+
+
+def changed_settings(previous, run):
+    """返回与上一个任务相比需要重新设置的项目, previous 为None时全部设置"""
+    if previous is None:
+        return dict(run)
+    return {key: value for key, value in run.items()
+            if previous.get(key) != value}
+
+
+class Campaign:
+    """批量任务及其检查点文件
+
+    每完成一个任务就写一次检查点, 程序中断后从第一个未完成的任务继续。
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, runs, completed=None, created=None):
+        self.path = path
+        self.runs = runs
+        self.completed = dict(completed or {})  # 任务序号(字符串) -> 完成时间
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != cls.VERSION:
+            raise ValueError("检查点文件版本不兼容")
+        return cls(path, data["runs"], data["completed"], data["created"])
+
+    def save(self):
+        """原子写入检查点, 写入中途崩溃不会损坏已有文件"""
+        data = {
+            "version": self.VERSION,
+            "created": self.created,
+            "runs": self.runs,
+            "completed": self.completed,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def next_index(self):
+        """第一个未完成任务的序号, 全部完成时返回None"""
+        for index in range(len(self.runs)):
+            if str(index) not in self.completed:
+                return index
+        return None
+
+    def mark_done(self, index):
+        self.completed[str(index)] = datetime.now().isoformat(timespec="seconds")
+
+    def is_finished(self):
+        return self.next_index() is None
+
+
+class CampaignRunner:
+    """按顺序执行批量任务, 由界面定时器周期调用 poll()
+
+    poll() 返回 (事件, 任务序号), 事件为 'started'、'running'、
+    'finished' 或 'done'。驱动异常直接抛出, 由调用方处理。
+    """
+
+    def __init__(self, tsl, campaign):
+        self.tsl = tsl
+        self.campaign = campaign
+        self.previous = None  # 设备上已生效的设置, 续跑时未知
+        self.current = None
+
+    def poll(self):
+        if self.current is None:
+            index = self.campaign.next_index()
+            if index is None:
+                return 'done', None
+            run = self.campaign.runs[index]
+            settings = changed_settings(self.previous, run)
+            # 清空之前遗留的错误, 之后的检查只针对本任务的设置
+            self.tsl.clear_errors()
+            # 设置全部成功且设备未报错后才记录, 中途出错时下一次全部重新设置
+            self.previous = None
+            for key, value in settings.items():
+                getattr(self.tsl, SETTERS[key])(value)
+            # 设备拒绝的设置(如功率超出范围)不能继续扫描, 否则会被记为完成
+            self.tsl.check_errors()
+            self.previous = run
+            self.tsl.start_sweep()
+            self.current = index
+            return 'started', index
+
+        if self.tsl.is_sweeping():
+            return 'running', self.current
+        index, self.current = self.current, None
+        self.campaign.mark_done(index)
+        self.campaign.save()
+        return 'finished', index
@@ -0,0 +1,187 @@
+"""多进程扫描数据后处理流水线
+
+扫描数据放入共享内存, 工作进程直接在共享内存上依次执行
+滤波、谐振分析和单位换算, 数据本身不经过序列化复制。
+任务队列中只传递共享内存名称和处理选项, 结果队列只返回谐振表,
+处理后的曲线由主进程从共享内存中读取(可抽稀)后释放。
+
+界面进程只负责提交和定时调用 poll(), 不做任何大数组计算。
+"""
+import multiprocessing
+import os
+import queue
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from resonance import analyze_sweep
+from sweep_archive import decimate
+from units import is_thz, nm_to_thz
+
+
+class PipelineError(Exception):
+    """工作进程无法启动"""
+
+
+def moving_average(values, window, out=None):
+    """滑动平均滤波, 忽略NaN点, 原本为NaN的点保持NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    kernel = np.ones(int(window))
+    total = np.convolve(np.where(finite, values, 0.0), kernel, "same")
+    count = np.convolve(finite.astype(np.float64), kernel, "same")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = np.where(finite, total / count, np.nan)
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+def process_block(block, unit="nm", smooth=1, min_depth=3.0):
+    """在 (2, N) 数组上原地执行各处理步骤, 返回谐振表
+
+    第0行为波长(nm), 第1行为透过率或功率(dB)。依次执行:
+    滑动平均(smooth>1时)、谐振分析(按nm)、横轴换算为 unit。
+    """
+    axis, values = block
+    if smooth > 1:
+        moving_average(values, smooth, out=values)
+    resonances = analyze_sweep(axis, values, min_depth)
+    if is_thz(unit):
+        nm_to_thz(axis, out=axis)
+    return resonances
+
+
+def _run_job(buffer, size, options):
+    block = np.ndarray((2, size), dtype=np.float64, buffer=buffer)
+    return process_block(block, **options)
+
+
+def _worker(tasks, results):
+    """工作进程主循环, 收到None时退出"""
+    while True:
+        job = tasks.get()
+        if job is None:
+            break
+        job_id, name, size, options = job
+        shm = shared_memory.SharedMemory(name=name)
+        # 在单独的函数中访问共享内存, 返回后不再引用缓冲区才能关闭
+        try:
+            resonances, error = _run_job(shm.buf, size, options), None
+        except Exception as e:
+            resonances, error = None, str(e)
+        shm.close()
+        results.put((job_id, resonances, error))
+
+
+class SweepPipeline:
+    """扫描数据后处理流水线, 工作进程在第一次提交任务时启动
+
+    poll() 返回已完成的任务列表, 每项为
+    (标签, 横轴单位, 横轴, 数值, 谐振表, 错误信息), 失败时谐振表为None。
+    谐振表中的波长始终为nm。
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        # 未完成任务过多时拒绝新任务, 避免共享内存无限增长
+        self.max_pending = max_pending or self.workers * 4
+        self.processes = []
+        self.pending = {}  # 任务编号 -> (共享内存, 标签, 点数, 单位)
+        self._next_id = 0
+        self._tasks = None
+        self._results = None
+
+    def start(self):
+        """启动工作进程, 失败时抛出 PipelineError"""
+        if self.processes:
+            return
+        try:
+            # POSIX下先启动资源跟踪进程, 工作进程与主进程共用同一个,
+            # 否则各自登记的共享内存会在退出时被误报为泄漏;
+            # Windows没有资源跟踪进程, 共享内存随句柄关闭释放
+            if os.name == "posix":
+                resource_tracker.ensure_running()
+            self._tasks = multiprocessing.Queue()
+            self._results = multiprocessing.Queue()
+            for _ in range(self.workers):
+                process = multiprocessing.Process(
+                    target=_worker, args=(self._tasks, self._results),
+                    daemon=True)
+                process.start()
+                self.processes.append(process)
+        except Exception as e:
+            for process in self.processes:
+                process.terminate()
+            self.processes = []
+            raise PipelineError(f"无法启动分析进程: {str(e)}") from e
+
+    @property
+    def busy(self):
+        return len(self.pending) >= self.max_pending
+
+    def submit(self, label, wavelength, values, unit="nm", smooth=1,
+               min_depth=3.0):
+        """提交一次扫描数据, 返回任务编号; 队列已满时返回None"""
+        if self.busy:
+            return None
+        wavelength = np.asarray(wavelength, dtype=np.float64).ravel()
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if wavelength.size != values.size:
+            raise ValueError("波长与数据点数不一致")
+        self.start()
+
+        size = wavelength.size
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1) * 16)
+        block = np.ndarray((2, size), dtype=np.float64, buffer=shm.buf)
+        block[0] = wavelength
+        block[1] = values
+        del block
+
+        job_id = self._next_id
+        self._next_id += 1
+        self.pending[job_id] = (shm, label, size, unit)
+        self._tasks.put((job_id, shm.name, size,
+                         {"unit": unit, "smooth": int(smooth),
+                          "min_depth": float(min_depth)}))
+        return job_id
+
+    def poll(self, max_points=None, limit=None):
+        """取回已完成的任务, 不阻塞; max_points 指定时曲线抽稀后返回"""
+        done = []
+        while self.pending and (limit is None or len(done) < limit):
+            try:
+                job_id, resonances, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            shm, label, size, unit = self.pending.pop(job_id)
+            axis, values = self._read_block(shm, size, max_points)
+            shm.close()
+            shm.unlink()
+            done.append((label, unit, axis, values, resonances, error))
+        return done
+
+    @staticmethod
+    def _read_block(shm, size, max_points):
+        block = np.ndarray((2, size), dtype=np.float64, buffer=shm.buf)
+        if max_points:
+            axis, values = decimate(block[0], block[1], max_points)
+        else:
+            axis, values = block
+        # 复制出共享内存, 之后才能释放
+        return axis.copy(), values.copy()
+
+    def close(self):
+        """停止工作进程并释放所有未完成任务的共享内存"""
+        for _ in self.processes:
+            self._tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        for shm, _, _, _ in self.pending.values():
+            shm.close()
+            shm.unlink()
+        self.pending.clear()
@@ -0,0 +1,144 @@
+"""激光器输出功率平坦化
+
+按设备序列号保存功率-波长响应, 预先计算每个扫描点的功率修正值,
+在软件步进扫描中与波长设置合并为同一条命令发送。
+"""
+import json
+import os
+
+import numpy as np
+
+
+class PowerCalibration:
+    """单台激光器在某一功率设置下的功率-波长响应"""
+
+    def __init__(self, serial, wavelength, power, set_power):
+        order = np.argsort(np.asarray(wavelength, dtype=np.float64))
+        self.serial = serial
+        self.wavelength = np.asarray(wavelength, dtype=np.float64)[order]
+        self.power = np.asarray(power, dtype=np.float64)[order]
+        self.set_power = float(set_power)
+
+    def build_lut(self, wavelengths, target=None, limits=None):
+        """计算各波长点的功率设置值, 使实际输出平坦为 target(dBm)
+
+        target 默认为校准时的功率设置; limits 为 (最小, 最大) 功率,
+        超出设备范围的设置值会被截断。
+        """
+        target = self.set_power if target is None else float(target)
+        measured = np.interp(np.asarray(wavelengths, dtype=np.float64),
+                             self.wavelength, self.power)
+        setpoints = self.set_power + (target - measured)
+        if limits is not None:
+            setpoints = np.clip(setpoints, limits[0], limits[1])
+        return setpoints
+
+    def to_dict(self):
+        return {
+            "serial": self.serial,
+            "wavelength": self.wavelength.tolist(),
+            "power": self.power.tolist(),
+            "set_power": self.set_power,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["serial"], data["wavelength"], data["power"],
+                   data["set_power"])
+
+
+class CalibrationStore:
+    """以设备序列号为键的校准数据文件(JSON)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, serial):
+        """读取指定序列号的校准数据, 不存在时返回None"""
+        data = self._read().get(serial)
+        return PowerCalibration.from_dict(data) if data else None
+
+    def save(self, calibration):
+        data = self._read()
+        data[calibration.serial] = calibration.to_dict()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class CalibrationRun:
+    """逐点测量功率-波长响应
+
+    每次调用 step() 先读取上一个点(已稳定)的功率, 再设置下一个波长,
+    由界面定时器按稳定时间调用。power_source 需提供 read_power(wavelength)。
+    驱动异常直接抛出, 由调用方处理。
+    """
+
+    def __init__(self, tsl, power_source, serial, wavelengths, set_power):
+        self.tsl = tsl
+        self.source = power_source
+        self.serial = serial
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.set_power = float(set_power)
+        self.power = np.full(self.wavelengths.size, np.nan)
+        self.index = -1
+
+    @property
+    def description(self):
+        return f"功率校准共 {self.wavelengths.size} 个点"
+
+    def start(self):
+        self.tsl.set_power_level(self.set_power)
+
+    def step(self):
+        """执行一步, 返回是否还有未完成的点"""
+        if self.index >= 0:
+            self.power[self.index] = self.source.read_power(
+                self.wavelengths[self.index])
+        self.index += 1
+        if self.index >= self.wavelengths.size:
+            return False
+        self.tsl.set_wavelength(self.wavelengths[self.index])
+        return True
+
+    def result(self):
+        return PowerCalibration(self.serial, self.wavelengths, self.power,
+                                self.set_power)
+
+
+class SteppedSweep:
+    """软件步进扫描, 每个点用一条命令同时设置波长和平坦化后的功率"""
+
+    def __init__(self, tsl, wavelengths, setpoints):
+        self.tsl = tsl
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        # 预先格式化所有参数, 扫描时只做一次写入
+        self.commands = [(f"{w:.4f}", f"{p:.2f}")
+                         for w, p in zip(self.wavelengths, setpoints)]
+        self.index = 0
+
+    @property
+    def description(self):
+        return f"步进扫描共 {len(self.commands)} 个点"
+
+    def start(self):
+        """功率随每个点一起设置, 无需预先设置"""
+
+    def step(self):
+        """设置下一个点, 返回是否还有未完成的点
+
+        与 CalibrationRun 相同, 最后一个点设置后仍返回True,
+        下一次调用(即最后一个点的驻留时间结束)才返回False
+        """
+        if self.index >= len(self.commands):
+            return False
+        self.tsl.set_wavelength_power(*self.commands[self.index])
+        self.index += 1
+        return True
@@ -0,0 +1,233 @@
+"""界面响应性监测与性能分析(--profile 启动模式)
+
+界面线程中的心跳定时器记录事件循环延迟; 后台线程定期检查心跳,
+心跳超过阈值未到达时采样界面线程的调用栈, 记录卡顿所在的槽函数
+和正在执行的SCPI命令。报告以JSON保存, 键有序, 便于不同版本间比较。
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from PyQt5.QtCore import QTimer
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_STALLS = 500  # 报告中保留的卡顿明细条数
+
+
+class CommandTracer:
+    """记录SCPI命令的耗时及当前正在执行的命令"""
+
+    TRACED = ("write", "read", "query", "query_binary_values")
+
+    def __init__(self):
+        self.current = None
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])  # 次数, 总耗时, 最大耗时
+        self._last_write = None
+
+    def wrap(self, device):
+        return _TracedDevice(device, self)
+
+    def call(self, method, name, args):
+        # read() 没有命令参数, 归到前一条写入的命令下
+        if args:
+            command = str(args[0])
+            key = command.split(" ")[0]
+        else:
+            command = f"{self._last_write} <{name}>"
+            key = f"{str(self._last_write).split(' ')[0]} <{name}>"
+        if name == "write":
+            self._last_write = command
+        self.current = command
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.current = None
+            entry = self.stats[key]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def summary(self):
+        return {key: {"count": count,
+                      "mean_ms": round(total / count * 1000, 3),
+                      "max_ms": round(peak * 1000, 3)}
+                for key, (count, total, peak) in sorted(self.stats.items())}
+
+
+class _TracedDevice:
+    """对VISA资源的透明包装, 只拦截读写方法"""
+
+    def __init__(self, device, tracer):
+        self._device = device
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._device, name)
+        if name not in CommandTracer.TRACED:
+            return attr
+        return lambda *args, **kwargs: self._tracer.call(
+            lambda *a: attr(*a, **kwargs), name, args)
+
+
+def _stack_frames(frame):
+    """返回从最外层到最内层的调用栈帧"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _frame_name(frame):
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+class EventLoopWatchdog:
+    """事件循环心跳监测, 可选采样调用栈作为采样式性能分析"""
+
+    def __init__(self, tracer=None, interval_ms=20, stall_ms=100,
+                 sample=False, sample_ms=5):
+        self.tracer = tracer
+        self.interval = interval_ms / 1000.0
+        self.stall = stall_ms / 1000.0
+        self.sample = sample
+        self.sample_interval = sample_ms / 1000.0
+
+        # 延迟按1ms分桶计数, 长时间运行内存不增长
+        self.latencies = Counter()
+        self.max_latency = 0.0
+        self.stalls = []
+        self.stall_count = 0
+        self.samples = Counter()
+        self._current_stall = None
+        self._started = None
+        self._last_beat = None
+        self._stop = threading.Event()
+        self._main_id = threading.main_thread().ident
+        self._lock = threading.Lock()
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self._beat)
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+
+    def start(self):
+        self._started = self._last_beat = time.perf_counter()
+        self.timer.start(int(self.interval * 1000))
+        self._thread.start()
+
+    def stop(self):
+        self.timer.stop()
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        now = time.perf_counter()
+        with self._lock:
+            latency = max(now - self._last_beat - self.interval, 0.0)
+            self.latencies[int(latency * 1000)] += 1
+            self.max_latency = max(self.max_latency, latency)
+            self._last_beat = now
+            if self._current_stall is not None:
+                stall = self._current_stall
+                stall["duration_ms"] = round((now - stall.pop("_start")) * 1000, 1)
+                self.stall_count += 1
+                if len(self.stalls) < MAX_STALLS:
+                    self.stalls.append(stall)
+                self._current_stall = None
+
+    def _monitor(self):
+        """后台线程: 检测卡顿并采样界面线程调用栈"""
+        period = self.sample_interval if self.sample else self.stall / 4
+        while not self._stop.wait(period):
+            frame = sys._current_frames().get(self._main_id)
+            if frame is None:
+                continue
+            frames = _stack_frames(frame)
+            if self.sample:
+                self.samples[";".join(_frame_name(f) for f in frames)] += 1
+
+            with self._lock:
+                blocked = time.perf_counter() - self._last_beat
+                if blocked < self.stall or self._current_stall is not None:
+                    continue
+                own = [f for f in frames
+                       if f.f_code.co_filename.startswith(PACKAGE_DIR)
+                       and f.f_code.co_filename != __file__
+                       and f.f_code.co_name not in ("main", "<module>")]
+                self._current_stall = {
+                    "_start": self._last_beat,
+                    "at_s": round(self._last_beat - self._started, 3),
+                    "slot": own[0].f_code.co_name if own else None,
+                    "location": _frame_name(own[-1]) if own else _frame_name(frames[-1]),
+                    "command": self.tracer.current if self.tracer else None,
+                }
+
+    def report(self):
+        total = sum(self.latencies.values())
+
+        def percentile(p):
+            seen = 0
+            for bucket in sorted(self.latencies):
+                seen += self.latencies[bucket]
+                if seen >= p * total:
+                    return bucket
+            return 0
+
+        slots = Counter(stall["slot"] for stall in self.stalls)
+        return {
+            "heartbeat_ms": round(self.interval * 1000, 1),
+            "stall_threshold_ms": round(self.stall * 1000, 1),
+            "heartbeats": total,
+            "latency_ms": {"p50": percentile(0.50), "p90": percentile(0.90),
+                           "p99": percentile(0.99),
+                           "max": round(self.max_latency * 1000, 1)},
+            "stall_count": self.stall_count,
+            "stalls_by_slot": dict(sorted((str(k), v) for k, v in slots.items())),
+            "stalls": self.stalls,
+            "commands": self.tracer.summary() if self.tracer else {},
+            "samples": dict(self.samples.most_common(50)),
+        }
+
+
+class ProfileSession:
+    """--profile 模式下的一次性能分析会话"""
+
+    def __init__(self, output, stall_ms=100, use_cprofile=False, sample=False):
+        self.output = output
+        self.tracer = CommandTracer()
+        self.watchdog = EventLoopWatchdog(self.tracer, stall_ms=stall_ms,
+                                          sample=sample)
+        self.profiler = cProfile.Profile() if use_cprofile else None
+
+    def start(self):
+        self.watchdog.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def finish(self):
+        """停止分析并写出报告, 返回报告文件路径"""
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.watchdog.stop()
+
+        with open(self.output, "w", encoding="utf-8") as f:
+            json.dump(self.watchdog.report(), f, ensure_ascii=False,
+                      indent=2, sort_keys=True)
+
+        if self.profiler is not None:
+            text = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=text)
+            stats.sort_stats("cumulative").print_stats(40)
+            with open(os.path.splitext(self.output)[0] + ".cprofile.txt", "w",
+                      encoding="utf-8") as f:
+                f.write(text.getvalue())
+        return self.output
@@ -0,0 +1,329 @@
+"""谐振峰(微环/谐振腔)分析
+
+在透过谱(dB)上检测谐振凹陷, 并对所有谐振批量做洛伦兹拟合,
+得到中心波长、消光比、半高全宽(FWHM)和Q值。
+全部计算基于数组运算, 便于在进程池中处理大量扫描数据。
+"""
+import warnings
+
+import numpy as np
+
+RESONANCE_DTYPE = np.dtype([
+    ("wavelength", "f8"),      # 中心波长(nm)
+    ("extinction_db", "f8"),   # 消光比(dB)
+    ("fwhm", "f8"),            # 半高全宽(nm)
+    ("q", "f8"),               # 品质因数
+])
+
+
+def rolling_baseline(transmission, window, percentile=50):
+    """滚动基线: 每 window 个点取一个百分位数, 再线性插值到每个点
+
+    NaN点不参与计算, 全部为NaN的段由相邻段插值。
+    缓慢的功率滚降会随基线一起变化, 不会被当作凹陷。
+    """
+    y = np.asarray(transmission, dtype=np.float64)
+    window = max(int(window), 1)
+    blocks = -(-y.size // window)
+    padded = np.concatenate([y, np.full(blocks * window - y.size, np.nan)])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        level = np.nanpercentile(padded.reshape(blocks, window), percentile,
+                                 axis=1)
+    centers = np.minimum((np.arange(blocks) + 0.5) * window - 0.5, y.size - 1)
+    ok = np.isfinite(level)
+    if not ok.any():
+        return np.full(y.size, np.nan)
+    centers, level = centers[ok], level[ok]
+    index = np.arange(y.size)
+    baseline = np.interp(index, centers, level)
+    if centers.size > 1:
+        # 两端半个窗口按相邻两段的斜率线性外推, 不截平
+        head = index < centers[0]
+        tail = index > centers[-1]
+        baseline[head] = level[0] + (index[head] - centers[0]) * (
+            (level[1] - level[0]) / (centers[1] - centers[0]))
+        baseline[tail] = level[-1] + (index[tail] - centers[-1]) * (
+            (level[-1] - level[-2]) / (centers[-1] - centers[-2]))
+    return baseline
+
+
+def _dip_regions(y, baseline, min_depth, min_gap, max_width):
+    """低于基线 min_depth 的区域, 返回 (起点, 终点) 索引数组"""
+    below = np.concatenate(([False], np.nan_to_num(baseline - y) >= min_depth,
+                            [False]))
+    edges = np.flatnonzero(np.diff(below.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    if starts.size == 0:
+        return starts, ends
+
+    # 合并间隔过小的区域
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] > min_gap))
+    starts = starts[keep]
+    ends = np.append(ends[np.flatnonzero(keep)[1:] - 1], ends[-1])
+
+    # 舍弃过宽的区域
+    keep = ends - starts <= max_width * y.size
+    return starts[keep], ends[keep]
+
+
+def _mask_regions(y, starts, ends, reach):
+    """将每个区域向两侧扩展 reach 倍宽度后置为NaN"""
+    pad = (ends - starts) * reach
+    edges = np.zeros(y.size + 1, dtype=np.intp)
+    np.add.at(edges, np.clip(starts - pad, 0, y.size), 1)
+    np.add.at(edges, np.clip(ends + pad, 0, y.size), -1)
+    return np.where(np.cumsum(edges[:-1]) > 0, np.nan, y)
+
+
+def _default_window(size):
+    return max(size // 32, 1)
+
+
+def _baseline_window(window, widths):
+    """基线窗口至少为最宽凹陷的8倍, 否则基线会跟随谐振本身"""
+    if len(widths) == 0:
+        return window
+    return max(window, 8 * int(np.max(widths)))
+
+
+def find_resonances(transmission, min_depth=3.0, min_gap=3, baseline=None,
+                    baseline_window=None, max_width=0.25):
+    """检测谐振凹陷, 返回 (中心点索引, 凹陷区域半宽点数, 基线dB)
+
+    低于基线 min_depth(dB) 的连续区域视为一个谐振, 间隔不超过
+    min_gap 个点的区域合并, 以免噪声把一个谐振拆成两个。
+    宽度超过总点数 max_width 倍的区域(如功率滚降段、信号丢失段)
+    不是谐振, 予以舍弃。
+
+    baseline 未指定时使用滚动基线(窗口 baseline_window 点, 默认为
+    总点数的1/32): 先用90百分位粗略找出凹陷, 将凹陷及其两侧的
+    洛伦兹尾部屏蔽后, 以中位数跟随功率变化, 再加上残差的75百分位
+    作为上包络。屏蔽范围默认为凹陷宽度的10倍, 屏蔽后没有剩余点时
+    (如只含一个谐振的窄扫描)逐步缩小, 以窗口两端的点作为基线。
+    这只是初始估计, analyze_sweep 会扣除拟合出的尾部后再修正基线。
+    """
+    y = np.asarray(transmission, dtype=np.float64)
+    if baseline is None:
+        window = baseline_window or _default_window(y.size)
+        rough = rolling_baseline(y, window, 90)
+        starts, ends = _dip_regions(y, rough, min_depth, min_gap, max_width)
+        window = _baseline_window(window, ends - starts)
+        # 凹陷本身低于90百分位基线, 屏蔽范围缩小到0时一定有剩余点
+        for reach in (10, 3, 1, 0):
+            masked = _mask_regions(y, starts, ends, reach)
+            if np.isfinite(masked).any():
+                break
+        level = rolling_baseline(masked, window)
+        baseline = level + rolling_baseline(masked - level, window, 75)
+    baseline = np.broadcast_to(np.asarray(baseline, dtype=np.float64), y.shape)
+    starts, ends = _dip_regions(y, baseline, min_depth, min_gap, max_width)
+    if starts.size == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, baseline
+
+    # 每个区域内的最小值位置: 按(区域, 数值)排序后取每组第一个
+    lengths = ends - starts
+    region = np.repeat(np.arange(starts.size), lengths)
+    points = (np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths)
+                                                   + lengths, lengths))
+    order = np.lexsort((np.nan_to_num(y[points], nan=np.inf), region))
+    first = np.concatenate(([0], np.flatnonzero(np.diff(region[order])) + 1))
+    centers = points[order][first]
+    half_widths = np.maximum((ends - starts) // 2, 1)
+    return centers, half_widths, baseline
+
+
+def fit_lorentzians(wavelength, transmission, centers, half_widths, baseline,
+                    span=3.0, previous=None, loss=None):
+    """对多个谐振同时做洛伦兹拟合, 返回 RESONANCE_DTYPE 结构数组
+
+    线性透过率凹陷 d = A / (1 + ((x - x0) / g)^2) 满足
+    1/d = a*x^2 + b*x + c, 因此对每个谐振解一个3x3加权最小二乘,
+    窗口大小相近的谐振堆叠后一次求解。拟合窗口为凹陷区域半宽的
+    span 倍; baseline 为标量或逐点基线(dB)。
+
+    previous 为上一次的拟合结果时, 拟合窗口内其他谐振的尾部按
+    上一次结果计算并计入基线, 相邻的谐振(如TE/TM两族)互不干扰。
+    loss 为 previous 的逐点总损耗(resonance_loss), 未指定时重新计算。
+    """
+    x = np.asarray(wavelength, dtype=np.float64)
+    y = np.asarray(transmission, dtype=np.float64)
+    baseline = np.broadcast_to(np.asarray(baseline, dtype=np.float64), y.shape)
+    centers = np.asarray(centers, dtype=np.intp)
+    result = np.full(centers.size, np.nan, dtype=RESONANCE_DTYPE)
+    if centers.size == 0:
+        return result
+
+    own = None
+    if previous is not None:
+        if loss is None:
+            loss = resonance_loss(x, previous)
+        own = _matching_resonances(x, centers, previous)
+
+    # 按窗口大小(向上取2的幂)分组, 每组只补齐到本组最宽的窗口
+    reach = np.maximum((np.asarray(half_widths) * span).astype(np.intp), 2)
+    groups = np.ceil(np.log2(reach)).astype(np.intp)
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        result[members] = _fit_group(
+            x, y, baseline, centers[members], reach[members], loss,
+            None if own is None else own[members])
+    return result
+
+
+def _matching_resonances(x, centers, previous):
+    """上一次结果中与每个中心对应的谐振
+
+    中心距上一次结果中最近的谐振超过一个FWHM时视为新谐振,
+    对应项的消光比置0(不扣除)。
+    """
+    previous = np.sort(previous[np.isfinite(previous["wavelength"])],
+                       order="wavelength")
+    if previous.size == 0:
+        return np.zeros(centers.size, dtype=RESONANCE_DTYPE)
+    position = x[centers]
+    right = np.minimum(np.searchsorted(previous["wavelength"], position),
+                       previous.size - 1)
+    left = np.maximum(right - 1, 0)
+    nearest = np.where(np.abs(previous["wavelength"][left] - position)
+                       < np.abs(previous["wavelength"][right] - position),
+                       left, right)
+    own = previous[nearest]
+    own["extinction_db"][np.abs(own["wavelength"] - position) > own["fwhm"]] = 0.0
+    return own
+
+
+def _lorentzian_loss(x, center, fwhm, extinction_db):
+    """单个洛伦兹凹陷在 x 处的损耗(dB)"""
+    peak = 1.0 - 10.0 ** (-extinction_db / 10.0)
+    u = 2.0 * (x - center) / fwhm
+    return 10.0 * np.log10(1.0 - peak / (1.0 + u ** 2))
+
+
+def _fit_group(x, y, baseline, centers, reach, loss=None, own=None):
+    """对窗口大小相近的一组谐振做批量拟合"""
+    result = np.full(centers.size, np.nan, dtype=RESONANCE_DTYPE)
+    offsets = np.arange(-reach.max(), reach.max() + 1)
+    index = centers[:, None] + offsets
+    valid = (np.abs(offsets) <= reach[:, None]) & (index >= 0) & (index < x.size)
+    index = np.clip(index, 0, x.size - 1)
+
+    level = baseline[index]
+    if loss is not None:
+        # 总损耗减去本谐振自身的部分, 即窗口内其他谐振的尾部
+        level = level + loss[index] - _lorentzian_loss(
+            x[index], own["wavelength"][:, None], own["fwhm"][:, None],
+            own["extinction_db"][:, None])
+    depth = 1.0 - 10.0 ** ((y[index] - level) / 10.0)
+    valid &= np.isfinite(depth) & (depth > 1e-6)
+    depth = np.where(valid, depth, 1.0)
+
+    # 以中心点为原点并归一化, 改善法方程的条件数
+    x_center = x[centers]
+    u = x[index] - x_center[:, None]
+    scale = np.max(np.abs(np.where(valid, u, 0.0)), axis=1)
+    scale = np.where(scale > 0, scale, 1.0)
+    u = u / scale[:, None]
+
+    weight = np.where(valid, depth ** 2, 0.0)
+    z = 1.0 / depth
+    basis = np.stack([u ** 2, u, np.ones_like(u)], axis=-1)
+    normal = np.einsum("pn,pni,pnj->pij", weight, basis, basis)
+    rhs = np.einsum("pn,pni,pn->pi", weight, basis, z)
+
+    solvable = np.abs(np.linalg.det(normal)) > 1e-12
+    coef = np.full((centers.size, 3), np.nan)
+    if solvable.any():
+        coef[solvable] = np.linalg.solve(normal[solvable],
+                                         rhs[solvable][..., None])[..., 0]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        a = coef[:, 0] / scale ** 2
+        b = coef[:, 1] / scale
+        c = coef[:, 2]
+        x0 = -b / (2.0 * a)
+        inv_peak = c - b ** 2 / (4.0 * a)
+        peak = 1.0 / inv_peak
+        fwhm = 2.0 * np.sqrt(inv_peak / a)
+        good = (a > 0) & (peak > 0) & (peak < 1) & np.isfinite(fwhm)
+        result["wavelength"] = np.where(good, x_center + x0, np.nan)
+        result["extinction_db"] = np.where(good, -10.0 * np.log10(1.0 - peak),
+                                           np.nan)
+        result["fwhm"] = np.where(good, fwhm, np.nan)
+        result["q"] = result["wavelength"] / result["fwhm"]
+    return result
+
+
+def resonance_loss(wavelength, resonances, reach=30.0):
+    """拟合出的谐振在每个点上造成的损耗(dB, 非正), wavelength 须递增
+
+    每个谐振只计算中心两侧 reach 倍FWHM以内的点, 更远处的尾部
+    深度不到峰值的 1/(1+4*reach^2), 可以忽略。
+    """
+    x = np.asarray(wavelength, dtype=np.float64)
+    resonances = resonances[np.isfinite(resonances["wavelength"])]
+    center, fwhm = resonances["wavelength"], resonances["fwhm"]
+    lo = np.searchsorted(x, center - reach * fwhm)
+    hi = np.searchsorted(x, center + reach * fwhm)
+
+    # 各谐振计算范围内的点索引拼接在一起, owner 为所属谐振
+    lengths = hi - lo
+    owner = np.repeat(np.arange(lengths.size), lengths)
+    points = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths
+                                                  - lo, lengths)
+    loss = _lorentzian_loss(x[points], center[owner], fwhm[owner],
+                            resonances["extinction_db"][owner])
+    return np.bincount(points, weights=loss, minlength=x.size)
+
+
+def refine_baseline(transmission, loss, centers, half_widths, baseline,
+                    window=None, span=3.0):
+    """扣除拟合出的谐振损耗 loss(resonance_loss)后重新估计基线
+
+    扣除后只剩基线和噪声, 屏蔽拟合窗口(残差最大处)后取滚动中位数,
+    不再受洛伦兹尾部影响。拟合窗口覆盖全部点时返回原基线。
+    """
+    y = np.asarray(transmission, dtype=np.float64)
+    corrected = y - loss
+    reach = np.maximum((np.asarray(half_widths) * span).astype(np.intp), 2)
+    masked = _mask_regions(corrected, centers - reach, centers + reach + 1, 0)
+    if not np.isfinite(masked).any():
+        return baseline
+    window = _baseline_window(window or _default_window(y.size),
+                              2 * np.asarray(half_widths))
+    return rolling_baseline(masked, window)
+
+
+def analyze_sweep(wavelength, transmission, min_depth=3.0, refine=3,
+                  max_width=0.25):
+    """分析一次扫描, 返回拟合成功的谐振结构数组
+
+    初始基线会被谐振尾部拉低, 使消光比偏大、FWHM偏小; 每次修正
+    扣除拟合出的尾部后重新估计基线并重新检测和拟合, 共 refine 次。
+    max_width 见 find_resonances。
+    该函数无界面依赖, 可直接提交到进程池执行
+    """
+    wavelength = np.asarray(wavelength, dtype=np.float64)
+    transmission = np.asarray(transmission, dtype=np.float64)
+    finite = np.isfinite(wavelength) & np.isfinite(transmission)
+    wavelength, transmission = wavelength[finite], transmission[finite]
+    order = np.argsort(wavelength, kind="stable")
+    wavelength, transmission = wavelength[order], transmission[order]
+
+    centers, half_widths, baseline = find_resonances(transmission, min_depth,
+                                                     max_width=max_width)
+    result = fit_lorentzians(wavelength, transmission, centers, half_widths,
+                             baseline)
+    for _ in range(refine):
+        if not np.isfinite(result["wavelength"]).any():
+            break
+        loss = resonance_loss(wavelength, result)
+        baseline = refine_baseline(transmission, loss, centers, half_widths,
+                                   baseline)
+        centers, half_widths, baseline = find_resonances(
+            transmission, min_depth, baseline=baseline, max_width=max_width)
+        result = fit_lorentzians(wavelength, transmission, centers,
+                                 half_widths, baseline, previous=result,
+                                 loss=loss)
+    return result[np.isfinite(result["wavelength"])]
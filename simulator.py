@@ -0,0 +1,230 @@
+"""模拟TSL激光器, 用于无硬件时的调试和长时间稳定性测试"""
+import time
+
+import numpy as np
+
+from units import nm_to_thz, thz_to_nm
+
+
+class SimulatedTSL:
+    """模拟TSL激光器的VISA资源
+
+    支持本程序用到的SCPI命令, 扫描进度按实际经过的时间计算,
+    time_scale 大于1时加速运行。latency 为每次读写的模拟总线延迟(秒)。
+    内部以nm保存波长, 绝对波长的设置和读取按 :UNIT:WAVelength 换算。
+    """
+
+    def __init__(self, time_scale=1.0, latency=0.0, serial="SIM00001", seed=None):
+        self.time_scale = time_scale
+        self.latency = latency
+        self.serial = serial
+        self.rng = np.random.default_rng(seed)
+        self.errors = []
+        self._response = ""
+
+        self.wavelength = 1550.0
+        self.power = 0.0
+        self.power_state = 0
+        self.unit = 0
+        self.sweep = {
+            'mode': 1, 'start': 1500.0, 'stop': 1600.0, 'step': 0.1,
+            'speed': 50.0, 'dwell': 0.1, 'cycles': 1
+        }
+        self.trigger_output = 0
+        self.trigger_step = 0.1
+        self._sweep_started = None
+
+        self._commands = {
+            "*RST": self._reset,
+            "*CLS": lambda arg: self.errors.clear(),
+            ":WAVELENGTH": self._set_wavelength('wavelength'),
+            ":POWER:LEVEL": self._set_float('power'),
+            ":POWER:STATE": self._set_int('power_state'),
+            ":UNIT:WAVELENGTH": self._set_int('unit'),
+            ":WAVELENGTH:SWEEP:MODE": self._set_sweep('mode', int),
+            ":WAVELENGTH:SWEEP:START": self._set_wavelength('start'),
+            ":WAVELENGTH:SWEEP:STOP": self._set_wavelength('stop'),
+            ":WAVELENGTH:SWEEP:STEP": self._set_sweep('step', float),
+            ":WAVELENGTH:SWEEP:SPEED": self._set_sweep('speed', float),
+            ":WAVELENGTH:SWEEP:DWELL": self._set_sweep('dwell', float),
+            ":WAVELENGTH:SWEEP:CYCLES": self._set_sweep('cycles', int),
+            ":WAVELENGTH:SWEEP:STATE": self._set_sweep_state,
+            ":WAVELENGTH:SWEEP:REPEAT": lambda arg: self._start_sweep(),
+            ":TRIGGER:OUTPUT": self._set_int('trigger_output'),
+            ":TRIGGER:OUTPUT:STEP": self._set_float('trigger_step'),
+        }
+        self._queries = {
+            "*IDN?": lambda: f"SANTEC,TSL-570,{self.serial},SIM",
+            ":WAVELENGTH?": lambda: f"{self._from_nm(self.wavelength):.6f}",
+            ":WAVELENGTH:RANGE?": lambda: ",".join(
+                f"{v:.6f}" for v in sorted(self._from_nm(np.array([1480.0, 1640.0])))),
+            ":POWER?": lambda: f"{self.power:.2f}",
+            ":POWER:RANGE?": lambda: "13.00",
+            ":POWER:STATE?": lambda: str(self.power_state),
+            ":UNIT:WAVELENGTH?": lambda: str(self.unit),
+            ":WAVELENGTH:SWEEP:COUNT?": lambda: str(self._sweep_count()),
+            ":WAVELENGTH:SWEEP:STATE?": lambda: "1" if self._sweeping() else "0",
+            ":SYSTEM:ERROR?": self._pop_error,
+        }
+
+    # VISA资源接口
+    def write(self, command):
+        self._delay()
+        for part in command.split(";"):
+            self._execute(part.strip())
+
+    def read(self):
+        self._delay()
+        response, self._response = self._response, ""
+        return response + "\n"
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def query_binary_values(self, command, datatype='f', is_big_endian=False,
+                            container=list, **kwargs):
+        self._delay()
+        wavelength = self._logged_wavelengths()
+        if command.upper().startswith(":READOUT:DATA:POW"):
+            data = self.power + 0.3 * np.sin(wavelength / 7.0) \
+                + self.rng.normal(0.0, 0.01, wavelength.size)
+        elif command.upper().startswith(":READOUT:DATA"):
+            data = self._from_nm(wavelength + self.rng.normal(0.0, 1e-4, wavelength.size))
+        else:
+            self.errors.append((-113, "Undefined header"))
+            data = np.empty(0)
+        return container(data.astype(np.float32))
+
+    def close(self):
+        pass
+
+    # 命令处理
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _execute(self, command):
+        header, _, arg = command.partition(" ")
+        header = _normalize(header)
+        if header.endswith("?"):
+            handler = self._queries.get(header)
+            if handler is None:
+                self.errors.append((-113, "Undefined header"))
+                self._response = ""
+            else:
+                self._response = handler()
+            return
+        handler = self._commands.get(header)
+        if handler is None:
+            self.errors.append((-113, "Undefined header"))
+            return
+        try:
+            handler(arg.strip())
+        except ValueError:
+            self.errors.append((-224, "Illegal parameter value"))
+
+    def _set_float(self, name):
+        return lambda arg: setattr(self, name, float(arg))
+
+    def _set_int(self, name):
+        return lambda arg: setattr(self, name, int(float(arg)))
+
+    def _to_nm(self, value):
+        return thz_to_nm(value) if self.unit else value
+
+    def _from_nm(self, value):
+        return nm_to_thz(value) if self.unit else value
+
+    def _set_wavelength(self, key):
+        """绝对波长按当前单位解析, 扫描起止波长保存在扫描设置中"""
+        def handler(arg):
+            value = float(self._to_nm(float(arg)))
+            if key == 'wavelength':
+                self.wavelength = value
+            else:
+                self.sweep[key] = value
+        return handler
+
+    def _set_sweep(self, key, kind):
+        def handler(arg):
+            self.sweep[key] = kind(float(arg))
+        return handler
+
+    def _set_sweep_state(self, arg):
+        if int(float(arg)):
+            self._start_sweep()
+        else:
+            self._sweep_started = None
+
+    def _reset(self, arg):
+        self.__init__(self.time_scale, self.latency, self.serial)
+
+    def _pop_error(self):
+        if not self.errors:
+            return '0,"No error"'
+        code, message = self.errors.pop(0)
+        return f'{code},"{message}"'
+
+    # 扫描模拟
+    def _start_sweep(self):
+        self._sweep_started = time.perf_counter()
+
+    def _cycle_time(self):
+        """一次循环所需的时间(秒)"""
+        span = abs(self.sweep['stop'] - self.sweep['start'])
+        if self.sweep['mode'] in (0, 2):
+            points = span / max(self.sweep['step'], 1e-6) + 1
+            duration = points * max(self.sweep['dwell'], 0.1)
+        else:
+            duration = span / max(self.sweep['speed'], 1e-6)
+        if self.sweep['mode'] in (2, 3):
+            duration *= 2
+        return max(duration, 1e-3)
+
+    def _sweep_count(self):
+        if self._sweep_started is None:
+            return 0
+        elapsed = (time.perf_counter() - self._sweep_started) * self.time_scale
+        return min(int(elapsed / self._cycle_time()), max(self.sweep['cycles'], 1))
+
+    def _sweeping(self):
+        return (self._sweep_started is not None
+                and self._sweep_count() < max(self.sweep['cycles'], 1))
+
+    def _logged_wavelengths(self):
+        start, stop = self.sweep['start'], self.sweep['stop']
+        step = self.trigger_step if self.trigger_output == 3 else self.sweep['step']
+        points = int(abs(stop - start) / max(abs(step), 1e-6)) + 1
+        return start + np.sign(stop - start) * abs(step) * np.arange(points)
+
+
+def _normalize(header):
+    """将SCPI命令头统一为长格式大写, 如 :WAV:SWE:STAR -> :WAVELENGTH:SWEEP:START"""
+    long_forms = {
+        "WAV": "WAVELENGTH", "SWE": "SWEEP", "STAR": "START", "SPE": "SPEED",
+        "DWEL": "DWELL", "CYCL": "CYCLES", "COUN": "COUNT", "STAT": "STATE",
+        "REP": "REPEAT", "MOD": "MODE", "POW": "POWER", "LEV": "LEVEL",
+        "TRIG": "TRIGGER", "OUTP": "OUTPUT", "RANG": "RANGE", "SYST": "SYSTEM",
+        "ERR": "ERROR", "READ": "READOUT", "DAT": "DATA",
+    }
+    query = header.endswith("?")
+    parts = header.rstrip("?").upper().split(":")
+    parts = [long_forms.get(p, p) for p in parts]
+    return ":".join(parts) + ("?" if query else "")
+
+
+class SimulatedResourceManager:
+    """模拟VISA资源管理器, 只提供一台模拟激光器"""
+
+    simulated = True
+
+    def __init__(self, address="GPIB0::1::INSTR", **kwargs):
+        self.address = address
+        self.kwargs = kwargs
+
+    def list_resources(self):
+        return (self.address,)
+
+    def open_resource(self, address):
+        return SimulatedTSL(**self.kwargs)
@@ -0,0 +1,203 @@
+"""长时间运行稳定性测试(浸泡测试)
+
+在模拟激光器上加速运行 TSL570GUI: 反复开始扫描、轮询扫描次数、
+读取并累加每个循环的数据、刷新光学状态。定期记录进程内存(RSS)、
+Qt对象数、日志行数、定时器数和命令耗时, 增长或漂移超过阈值时失败。
+
+用法: python soak.py --cycles 5000 --duration 600
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QTimer
+
+import TSL570_Qt
+from simulator import SimulatedResourceManager
+
+
+def read_rss_mb():
+    """当前进程常驻内存(MB), 无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class SoakMonitor:
+    """记录资源占用和命令耗时的采样"""
+
+    def __init__(self, app, window):
+        self.app = app
+        self.window = window
+        self.samples = []
+        self.latencies = []  # (时间, 耗时秒)
+
+    def timed(self, func):
+        start = time.perf_counter()
+        func()
+        self.latencies.append((start, time.perf_counter() - start))
+
+    def sample(self, elapsed, cycles):
+        window = self.window
+        self.samples.append({
+            "elapsed_s": round(elapsed, 2),
+            "cycles": cycles,
+            "rss_mb": read_rss_mb(),
+            "qt_objects": len(window.findChildren(QObject)) + len(self.app.allWidgets()),
+            "timers": len(window.findChildren(QTimer)),
+            "log_blocks": window.log_text.document().blockCount(),
+        })
+
+    def latency_drift(self, fraction=0.1):
+        """最后一段与最前一段的平均命令耗时(毫秒)"""
+        n = max(int(len(self.latencies) * fraction), 1)
+        head = [d for _, d in self.latencies[:n]]
+        tail = [d for _, d in self.latencies[-n:]]
+        return (sum(head) / len(head) * 1000, sum(tail) / len(tail) * 1000)
+
+
+def check(monitor, args):
+    """根据阈值判断测试结果, 返回失败原因列表"""
+    failures = []
+    # 跳过预热阶段, 以稳定后的第一个采样为基准
+    warm = monitor.samples[min(len(monitor.samples) // 10 + 1, len(monitor.samples) - 1)]
+    last = monitor.samples[-1]
+
+    if warm["rss_mb"] is not None and last["rss_mb"] is not None:
+        growth = last["rss_mb"] - warm["rss_mb"]
+        if growth > args.max_rss_growth:
+            failures.append(f"内存增长 {growth:.1f}MB 超过 {args.max_rss_growth}MB")
+    growth = last["qt_objects"] - warm["qt_objects"]
+    if growth > args.max_object_growth:
+        failures.append(f"Qt对象增加 {growth} 个, 超过 {args.max_object_growth}")
+    growth = last["timers"] - monitor.samples[0]["timers"]
+    if growth > 0:
+        failures.append(f"定时器增加 {growth} 个")
+    if last["log_blocks"] > args.max_log_blocks:
+        failures.append(f"日志 {last['log_blocks']} 行, 超过 {args.max_log_blocks}")
+
+    head, tail = monitor.latency_drift()
+    if tail > head * args.max_latency_drift + args.latency_floor_ms:
+        failures.append(f"命令耗时从 {head:.3f}ms 漂移到 {tail:.3f}ms")
+    return failures
+
+
+def run_soak(args):
+    # 测试数据写入临时目录, 不影响正式的存档和校准数据, 结束后删除
+    workdir = tempfile.mkdtemp(prefix="tsl_soak_")
+    try:
+        return _run_soak(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_soak(args, workdir):
+    TSL570_Qt.ARCHIVE_DIR = os.path.join(workdir, "sweep_archive")
+    TSL570_Qt.CALIBRATION_FILE = os.path.join(workdir, "power_calibration.json")
+    TSL570_Qt.CAMPAIGN_FILE = os.path.join(workdir, "campaign_checkpoint.json")
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = TSL570_Qt.TSL570GUI(resource_manager=SimulatedResourceManager(
+        time_scale=args.time_scale, latency=args.latency_ms / 1000.0))
+    window.connect_device()
+    window.archive_check.setChecked(args.archive)
+    for key, value in (('start', 1540), ('stop', 1560), ('step', 0.01),
+                       ('speed', 20), ('cycles', 999)):
+        window.sweep_inputs[key].setText(str(value))
+    window.setup_sweep()
+    window.start_sweep()
+
+    monitor = SoakMonitor(app, window)
+    started = time.perf_counter()
+    next_sample = started
+    cycles = polls = 0
+    # 出错时也要关闭窗口, 释放存档文件后才能删除临时目录
+    try:
+        while cycles < args.cycles and time.perf_counter() - started < args.duration:
+            before = window._last_cycle_count
+            monitor.timed(window.update_sweep_count)
+            cycles += max(window._last_cycle_count - before, 0)
+            polls += 1
+            if polls % args.status_every == 0:
+                monitor.timed(window.refresh_optical_status)
+            # 模拟器完成全部循环后重新开始扫描
+            if not window.tsl.is_sweeping():
+                window.start_sweep()
+            app.processEvents()
+
+            now = time.perf_counter()
+            if now >= next_sample:
+                monitor.sample(now - started, cycles)
+                next_sample = now + args.sample_interval
+            time.sleep(args.poll_ms / 1000.0)
+
+        monitor.sample(time.perf_counter() - started, cycles)
+    finally:
+        window.close()
+
+    failures = check(monitor, args)
+    head, tail = monitor.latency_drift()
+    report = {
+        "cycles": cycles,
+        "polls": polls,
+        "duration_s": round(time.perf_counter() - started, 1),
+        "latency_ms": {"head": round(head, 4), "tail": round(tail, 4)},
+        "samples": monitor.samples,
+        "failures": failures,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TSL激光器控制程序浸泡测试")
+    parser.add_argument("--cycles", type=int, default=5000, help="目标扫描循环数")
+    parser.add_argument("--duration", type=float, default=3600, help="最长运行时间(秒)")
+    parser.add_argument("--time-scale", type=float, default=1000, help="模拟器加速倍数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟总线延迟(毫秒)")
+    parser.add_argument("--poll-ms", type=float, default=1, help="轮询间隔(毫秒)")
+    parser.add_argument("--status-every", type=int, default=10,
+                        help="每多少次轮询刷新一次光学状态")
+    parser.add_argument("--sample-interval", type=float, default=5,
+                        help="资源采样间隔(秒)")
+    parser.add_argument("--archive", action="store_true", help="同时测试数据存档")
+    parser.add_argument("--max-rss-growth", type=float, default=50, help="内存增长上限(MB)")
+    parser.add_argument("--max-object-growth", type=int, default=20, help="Qt对象增长上限")
+    parser.add_argument("--max-log-blocks", type=int,
+                        default=TSL570_Qt.TSL570GUI.LOG_MAX_BLOCKS, help="日志行数上限")
+    parser.add_argument("--max-latency-drift", type=float, default=1.5,
+                        help="命令耗时漂移倍数上限")
+    parser.add_argument("--latency-floor-ms", type=float, default=0.5,
+                        help="耗时漂移判断时允许的绝对增量(毫秒)")
+    parser.add_argument("--output", default="soak_report.json", help="报告文件")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    report = run_soak(args)
+    print(f"循环 {report['cycles']} 次, 轮询 {report['polls']} 次, "
+          f"耗时 {report['duration_s']} 秒")
+    for failure in report["failures"]:
+        print(f"失败: {failure}")
+    if not report["failures"]:
+        print("通过")
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""轻量的光谱曲线显示控件"""
+import numpy as np
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF
+
+
+class SpectrumPlot(QWidget):
+    """多条曲线叠加显示, 数据应预先抽稀到与控件宽度相当的点数"""
+
+    COLORS = ["#2980b9", "#c0392b", "#27ae60", "#8e44ad",
+              "#f39c12", "#16a085", "#2c3e50", "#d35400"]
+    MARGIN = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.curves = []
+        self.unit = "nm"
+        self.setMinimumHeight(250)
+
+    def set_curves(self, curves, unit="nm"):
+        """curves 为 [(名称, 横轴数组, 数值数组), ...], unit 为横轴单位"""
+        self.unit = unit
+        self.curves = [(label, np.asarray(x, dtype=np.float64),
+                        np.asarray(y, dtype=np.float64))
+                       for label, x, y in curves]
+        self.update()
+
+    def clear(self):
+        self.set_curves([])
+
+    def _bounds(self):
+        xs = [x[np.isfinite(x)] for _, x, _ in self.curves]
+        ys = [y[np.isfinite(y)] for _, _, y in self.curves]
+        xs = np.concatenate(xs) if xs else np.empty(0)
+        ys = np.concatenate(ys) if ys else np.empty(0)
+        if xs.size == 0 or ys.size == 0:
+            return None
+        x0, x1, y0, y1 = xs.min(), xs.max(), ys.min(), ys.max()
+        if x1 == x0:
+            x1 = x0 + 1
+        if y1 == y0:
+            y1 = y0 + 1
+        return x0, x1, y0, y1
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        area = QRectF(self.MARGIN, 10, self.width() - self.MARGIN - 10,
+                      self.height() - self.MARGIN)
+        painter.setPen(QPen(QColor("#bdc3c7")))
+        painter.drawRect(area)
+
+        bounds = self._bounds()
+        if bounds is None:
+            painter.drawText(area, Qt.AlignCenter, "无数据")
+            return
+        x0, x1, y0, y1 = bounds
+
+        # 坐标范围标注
+        painter.setPen(QPen(QColor("#2c3e50")))
+        painter.drawText(QPointF(area.left(), area.bottom() + 15), f"{x0:.3f}")
+        painter.drawText(QRectF(area.right() - 150, area.bottom() + 2, 150, 15),
+                         Qt.AlignRight, f"{x1:.3f} {self.unit}")
+        painter.drawText(QRectF(0, area.top(), self.MARGIN - 4, 15),
+                         Qt.AlignRight, f"{y1:.2f}")
+        painter.drawText(QRectF(0, area.bottom() - 15, self.MARGIN - 4, 15),
+                         Qt.AlignRight, f"{y0:.2f}")
+
+        painter.setRenderHint(QPainter.Antialiasing)
+        for i, (label, x, y) in enumerate(self.curves):
+            color = QColor(self.COLORS[i % len(self.COLORS)])
+            px = area.left() + (x - x0) / (x1 - x0) * area.width()
+            py = area.bottom() - (y - y0) / (y1 - y0) * area.height()
+            finite = np.isfinite(px) & np.isfinite(py)
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(QPolygonF(
+                [QPointF(a, b) for a, b in zip(px[finite], py[finite])]))
+            painter.drawText(QPointF(area.left() + 8, area.top() + 15 * (i + 1)),
+                             label)
@@ -0,0 +1,154 @@
+"""扫描数据存档及SQLite索引
+
+每次扫描的数据保存为独立的 .npz 文件, 参数和摘要统计写入SQLite索引。
+浏览历史记录时只查询索引, 需要显示曲线时才读取数据文件并抽稀。
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    serial TEXT,
+    model TEXT,
+    kind TEXT,
+    start_nm REAL,
+    stop_nm REAL,
+    step_nm REAL,
+    power REAL,
+    speed REAL,
+    cycles INTEGER,
+    points INTEGER,
+    y_min REAL,
+    y_max REAL,
+    y_mean REAL,
+    path TEXT NOT NULL,
+    params TEXT
+);
+CREATE INDEX IF NOT EXISTS sweeps_created ON sweeps (created_at);
+CREATE INDEX IF NOT EXISTS sweeps_serial ON sweeps (serial, created_at);
+"""
+
+# 可作为独立列保存, 便于筛选的扫描参数
+PARAM_COLUMNS = ("start_nm", "stop_nm", "step_nm", "power", "speed", "cycles")
+
+
+def decimate(x, y, max_points):
+    """最小/最大值抽稀, 保留每段内的峰谷, 返回不超过 max_points 个点"""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    buckets = max(max_points // 2, 1)
+    if x.size <= max_points:
+        return x, y
+    size = -(-x.size // buckets)
+    pad = buckets * size - x.size
+    xs = np.concatenate([x, np.full(pad, x[-1])]).reshape(buckets, size)
+    ys = np.concatenate([y, np.full(pad, np.nan)]).reshape(buckets, size)
+    filled = np.where(np.isnan(ys), np.inf, ys)
+    lo = np.argmin(filled, axis=1)
+    hi = np.argmax(np.where(np.isnan(ys), -np.inf, ys), axis=1)
+    # 每段内按原始顺序输出最小值和最大值
+    first = np.minimum(lo, hi)
+    second = np.maximum(lo, hi)
+    index = np.stack([first, second], axis=1)
+    return (np.take_along_axis(xs, index, axis=1).ravel(),
+            np.take_along_axis(ys, index, axis=1).ravel())
+
+
+class SweepArchive:
+    """扫描数据存档"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, "data"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def save_sweep(self, wavelength, values, params=None, serial="", model="",
+                   kind="power"):
+        """保存一次扫描数据并写入索引, 返回记录编号"""
+        wavelength = np.asarray(wavelength, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        params = dict(params or {})
+        now = datetime.now()
+        finite = values[np.isfinite(values)]
+
+        folder = os.path.join("data", now.strftime("%Y%m%d"))
+        os.makedirs(os.path.join(self.root, folder), exist_ok=True)
+        path = os.path.join(folder, now.strftime("%H%M%S_%f") + ".npz")
+        np.savez(os.path.join(self.root, path), wavelength=wavelength,
+                 values=values)
+
+        row = {
+            "created_at": now.isoformat(timespec="seconds"),
+            "serial": serial,
+            "model": model,
+            "kind": kind,
+            "points": int(values.size),
+            "y_min": float(finite.min()) if finite.size else None,
+            "y_max": float(finite.max()) if finite.size else None,
+            "y_mean": float(finite.mean()) if finite.size else None,
+            "path": path,
+            "params": json.dumps(params, ensure_ascii=False),
+        }
+        for key in PARAM_COLUMNS:
+            row[key] = params.get(key)
+        if row["start_nm"] is None and wavelength.size:
+            row["start_nm"] = float(np.nanmin(wavelength))
+            row["stop_nm"] = float(np.nanmax(wavelength))
+
+        columns = ", ".join(row)
+        marks = ", ".join("?" * len(row))
+        with self.db:
+            cursor = self.db.execute(
+                f"INSERT INTO sweeps ({columns}) VALUES ({marks})",
+                list(row.values()))
+        return cursor.lastrowid
+
+    def query(self, serial=None, since=None, until=None, wavelength=None,
+              kind=None, limit=500):
+        """按条件查询索引, 最新的记录在前
+
+        wavelength 为单个波长(nm), 只返回扫描范围包含该波长的记录
+        """
+        clauses, args = [], []
+        if serial:
+            clauses.append("serial = ?")
+            args.append(serial)
+        if since:
+            clauses.append("created_at >= ?")
+            args.append(since)
+        if until:
+            clauses.append("created_at < ?")
+            args.append(until)
+        if wavelength is not None:
+            clauses.append("MIN(start_nm, stop_nm) <= ? AND MAX(start_nm, stop_nm) >= ?")
+            args += [wavelength, wavelength]
+        if kind:
+            clauses.append("kind = ?")
+            args.append(kind)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.db.execute(
+            f"SELECT * FROM sweeps {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            args + [limit]).fetchall()
+
+    def load(self, sweep_id, max_points=None):
+        """读取一次扫描的数据, 指定 max_points 时抽稀后返回"""
+        row = self.db.execute("SELECT path FROM sweeps WHERE id = ?",
+                              (sweep_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"没有编号为 {sweep_id} 的扫描记录")
+        with np.load(os.path.join(self.root, row["path"])) as data:
+            wavelength, values = data["wavelength"], data["values"]
+        if max_points:
+            return decimate(wavelength, values, max_points)
+        return wavelength, values
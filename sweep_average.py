@@ -0,0 +1,94 @@
+"""多循环扫描在线平均"""
+import numpy as np
+
+
+class SweepAccumulator:
+    """在公共波长网格上累加多次扫描循环的统计量
+
+    每个循环的波长/功率数组先插值到公共网格, 再用Welford算法更新
+    均值和方差, 同时记录最小值和最大值。内存只与网格点数有关,
+    与循环次数无关。
+    """
+
+    def __init__(self, grid):
+        self.grid = np.asarray(grid, dtype=np.float64)
+        if self.grid.ndim != 1 or self.grid.size < 2:
+            raise ValueError("波长网格至少需要两个点")
+        self.reset()
+
+    @classmethod
+    def from_range(cls, start, stop, step):
+        """根据起始/结束波长和步长(nm)生成公共网格"""
+        start, stop, step = float(start), float(stop), abs(float(step))
+        if step == 0 or stop == start:
+            raise ValueError("扫描范围或步长无效")
+        lo, hi = min(start, stop), max(start, stop)
+        points = int(round((hi - lo) / step)) + 1
+        return cls(np.linspace(lo, lo + (points - 1) * step, points))
+
+    def reset(self):
+        """清空所有累加结果"""
+        size = self.grid.size
+        self.cycles = 0
+        self.count = np.zeros(size, dtype=np.int64)
+        self._mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+        self._min = np.full(size, np.inf)
+        self._max = np.full(size, -np.inf)
+
+    def add_cycle(self, wavelength, power):
+        """累加一个循环的数据, 网格外的点不参与统计"""
+        wavelength = np.asarray(wavelength, dtype=np.float64).ravel()
+        power = np.asarray(power, dtype=np.float64).ravel()
+        if wavelength.size != power.size or wavelength.size < 2:
+            raise ValueError("波长与功率数据长度不一致或点数不足")
+
+        # 往复扫描的回程波长递减, 插值前统一排序
+        order = np.argsort(wavelength, kind="stable")
+        values = np.interp(self.grid, wavelength[order], power[order],
+                           left=np.nan, right=np.nan)
+
+        valid = np.isfinite(values)
+        self.count += valid
+        values = np.where(valid, values, 0.0)
+        delta = np.where(valid, values - self._mean, 0.0)
+        self._mean += delta / np.maximum(self.count, 1)
+        self._m2 += delta * (values - self._mean)
+        np.minimum(self._min, np.where(valid, values, np.inf), out=self._min)
+        np.maximum(self._max, np.where(valid, values, -np.inf), out=self._max)
+        self.cycles += 1
+
+    @property
+    def mean(self):
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def variance(self):
+        """样本方差, 少于两个循环的点为NaN"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1,
+                            self._m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def minimum(self):
+        return np.where(self.count > 0, self._min, np.nan)
+
+    @property
+    def maximum(self):
+        return np.where(self.count > 0, self._max, np.nan)
+
+    def snapshot(self):
+        """返回当前统计结果的副本, 供界面显示或保存"""
+        return {
+            "cycles": self.cycles,
+            "wavelength": self.grid.copy(),
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.minimum,
+            "max": self.maximum,
+            "count": self.count.copy(),
+        }
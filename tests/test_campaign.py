@@ -0,0 +1,88 @@
+import itertools
+
+import pytest
+
+from campaign import (Campaign, CampaignRunner, changed_settings,
+                      expand_grid, gray_order)
+
+
+@pytest.mark.parametrize("sizes", [[3], [2, 3], [3, 1, 4], [2, 2, 2, 2]])
+def test_gray_order_covers_grid_with_single_changes(sizes):
+    order = gray_order(sizes)
+    assert sorted(order) == list(itertools.product(*map(range, sizes)))
+    for a, b in zip(order, order[1:]):
+        assert sum(x != y for x, y in zip(a, b)) == 1
+
+
+def test_expand_grid_and_changed_settings():
+    runs = expand_grid([("range", [{"start": 1500, "stop": 1510},
+                                   {"start": 1510, "stop": 1520}]),
+                        ("power", [0, 5]),
+                        ("speed", [])],
+                       fixed={"cycles": 1})
+    assert len(runs) == 4
+    assert all(run["cycles"] == 1 for run in runs)
+    for previous, run in zip(runs, runs[1:]):
+        assert len(changed_settings(previous, run)) in (1, 2)
+    assert changed_settings(None, runs[0]) == runs[0]
+
+
+class FakeLaser:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.sweeping = False
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name,) + args)
+
+    def check_errors(self):
+        if self.error:
+            raise RuntimeError(self.error)
+
+    def start_sweep(self):
+        self.calls.append(("start_sweep",))
+        self.sweeping = True
+
+    def is_sweeping(self):
+        return self.sweeping
+
+
+def test_runner_checkpoints_and_resumes(tmp_path):
+    path = str(tmp_path / "campaign.json")
+    campaign = Campaign(path, expand_grid([("power", [0, 1])]))
+    laser = FakeLaser()
+    runner = CampaignRunner(laser, campaign)
+    assert runner.poll() == ("started", 0)
+    assert runner.poll() == ("running", 0)
+    laser.sweeping = False
+    assert runner.poll() == ("finished", 0)
+
+    resumed = Campaign.load(path)
+    assert resumed.next_index() == 1
+    runner = CampaignRunner(laser, resumed)
+    assert runner.poll() == ("started", 1)
+    laser.sweeping = False
+    assert runner.poll() == ("finished", 1)
+    assert runner.poll() == ("done", None)
+
+
+def test_rejected_settings_do_not_start_sweep(tmp_path):
+    campaign = Campaign(str(tmp_path / "campaign.json"),
+                        expand_grid([("power", [99])]))
+    laser = FakeLaser(error="Parameter out of range")
+    runner = CampaignRunner(laser, campaign)
+    with pytest.raises(RuntimeError):
+        runner.poll()
+    assert ("start_sweep",) not in laser.calls
+    assert campaign.next_index() == 0
+    assert runner.previous is None
+
+
+def test_stale_errors_cleared_before_settings(tmp_path):
+    campaign = Campaign(str(tmp_path / "campaign.json"),
+                        expand_grid([("power", [0])]))
+    laser = FakeLaser()
+    assert CampaignRunner(laser, campaign).poll() == ("started", 0)
+    assert laser.calls[0] == ("clear_errors",)
+    assert laser.calls[-1] == ("start_sweep",)
@@ -0,0 +1,226 @@
+import time
+
+import numpy as np
+import pytest
+
+from simulator import SimulatedResourceManager, SimulatedTSL
+from TSL570_Qt import (TSL570, CommandError, CommunicationError,
+                       NotConnectedError, ParameterError, SweepMode,
+                       SweepState, WavelengthUnit)
+
+ADDRESS = "GPIB0::1::INSTR"
+
+
+class DeviceManager(SimulatedResourceManager):
+    """返回事先创建的模拟设备, 便于测试中修改其应答"""
+
+    def __init__(self, device):
+        super().__init__()
+        self.device = device
+
+    def open_resource(self, address):
+        return self.device
+
+
+def connect(device=None):
+    device = device or SimulatedTSL()
+    tsl = TSL570(resource_manager=DeviceManager(device))
+    tsl.connect_device(ADDRESS)
+    return tsl, device
+
+
+def test_connect_reads_device_info():
+    tsl, _ = connect()
+    assert tsl.is_connected()
+    assert tsl.device_info["serial"] == "SIM00001"
+    assert tsl.device_info["max_power"] == "13.00"
+
+
+def test_not_connected():
+    tsl = TSL570(resource_manager=SimulatedResourceManager())
+    with pytest.raises(NotConnectedError):
+        tsl.set_wavelength(1550)
+
+
+def test_unparsable_reply_raises_communication_error():
+    tsl, device = connect()
+    device._queries[":POWER?"] = lambda: "garbage"
+    with pytest.raises(CommunicationError, match=":POWer?"):
+        tsl.read_power()
+    device._queries[":WAVELENGTH:SWEEP:COUNT?"] = lambda: ""
+    with pytest.raises(CommunicationError):
+        tsl.read_sweep_count()
+
+
+def test_invalid_enum_raises_parameter_error():
+    tsl, device = connect()
+    tsl.set_sweep_mode("step_two_way")
+    assert device.sweep["mode"] == SweepMode.STEP_TWO_WAY
+    for method, value in ((tsl.set_sweep_mode, "DIAGONAL"),
+                          (tsl.set_sweep_mode, 9),
+                          (tsl.set_trigger_output, "NEVER"),
+                          (tsl.set_wave_unit, "GHZ")):
+        with pytest.raises(ParameterError):
+            method(value)
+    assert not device.errors
+
+
+def test_check_errors_raises_command_error_with_code():
+    tsl, device = connect()
+    tsl.check_errors()
+    device.write(":BOGUS 1")
+    device.write(":POWER:LEVEL abc")
+    with pytest.raises(CommandError) as info:
+        tsl.check_errors()
+    assert info.value.code == -113
+    assert "-224" in str(info.value)
+    # 错误队列已读空
+    tsl.check_errors()
+
+
+def test_clear_errors():
+    tsl, device = connect()
+    device.write(":BOGUS 1")
+    tsl.clear_errors()
+    tsl.check_errors()
+
+
+def test_connect_failure_resets_state():
+    device = SimulatedTSL()
+    device._queries[":WAVELENGTH:RANGE?"] = lambda: "not,a,range"
+    device._queries[":UNIT:WAVELENGTH?"] = lambda: "1"
+    closed = []
+    device.close = lambda: closed.append(True)
+    tsl = TSL570(resource_manager=DeviceManager(device))
+    with pytest.raises(CommunicationError):
+        tsl.connect_device(ADDRESS)
+    assert not tsl.is_connected()
+    assert closed == [True]
+    with pytest.raises(NotConnectedError):
+        tsl.read_power()
+
+
+def test_open_failure_raises_communication_error():
+    class BrokenManager(SimulatedResourceManager):
+        def open_resource(self, address):
+            raise OSError("no such resource")
+
+    tsl = TSL570(resource_manager=BrokenManager())
+    with pytest.raises(CommunicationError, match="no such resource"):
+        tsl.connect_device(ADDRESS)
+    assert not tsl.is_connected()
+
+
+def test_sweep_count_and_state():
+    tsl, device = connect(SimulatedTSL(time_scale=10))
+    tsl.set_sweep_mode(SweepMode.CONTINUOUS_ONE_WAY)
+    tsl.set_sweep_start(1540)
+    tsl.set_sweep_stop(1560)
+    tsl.set_sweep_speed(100)
+    tsl.set_sweep_cycles(2)
+    assert tsl.read_sweep_count() == 0
+    assert tsl.read_sweep_state() == SweepState.STOPPED
+    assert not tsl.is_sweeping()
+
+    tsl.start_sweep()
+    assert tsl.is_sweeping()
+    time.sleep(0.1)  # 每个循环0.2秒, 加速10倍后20毫秒
+    assert tsl.read_sweep_count() == 2
+    assert not tsl.is_sweeping()
+    tsl.stop_sweep()
+    assert tsl.read_sweep_count() == 0
+
+
+def test_read_wave_unit():
+    tsl, device = connect()
+    assert tsl.read_wave_unit() == WavelengthUnit.NM
+    device._queries[":UNIT:WAVELENGTH?"] = lambda: "x"
+    with pytest.raises(CommunicationError):
+        tsl.read_wave_unit()
+
+
+def recording(device):
+    """记录发送到模拟设备的命令"""
+    sent = []
+    write = device.write
+    device.write = lambda command: (sent.append(command), write(command))
+    return sent
+
+
+def test_wavelengths_in_thz_mode():
+    tsl, device = connect()
+    tsl.set_wave_unit("THZ")
+    assert device.unit == 1
+    tsl.set_wavelength(1550.5)
+    assert device.wavelength == pytest.approx(1550.5, abs=1e-5)
+    assert tsl.read_wavelength() == pytest.approx(1550.5, abs=1e-5)
+    tsl.set_sweep_start("1540")
+    tsl.set_sweep_stop(1560)
+    assert device.sweep["start"] == pytest.approx(1540, abs=1e-5)
+    assert device.sweep["stop"] == pytest.approx(1560, abs=1e-5)
+
+
+def test_device_info_in_thz_mode():
+    device = SimulatedTSL()
+    device.unit = 1
+    tsl, _ = connect(device)
+    assert tsl.wave_unit == WavelengthUnit.THZ
+    assert tsl.device_info["wavelength_range"] == "1480.000,1640.000"
+
+
+def test_steps_keep_thz_unit():
+    tsl, device = connect()
+    tsl.set_wave_unit(WavelengthUnit.THZ)
+    sent = recording(device)
+    tsl.set_sweep_step(0.01)
+    tsl.set_trigger_step(0.002)
+    assert device.sweep["step"] == 0.01
+    assert device.trigger_step == 0.002
+    assert device.unit == 1
+    assert tsl.wave_unit == WavelengthUnit.THZ
+    assert len(sent) == 2
+    assert all(c.endswith(":UNIT:WAVelength 1") for c in sent)
+
+
+def test_steps_in_nm_mode_sent_directly():
+    tsl, device = connect()
+    sent = recording(device)
+    tsl.set_sweep_step(0.01)
+    assert sent == [":WAVelength:SWEep:STEP 0.01"]
+
+
+def test_read_sweep_data_converts_thz():
+    tsl, device = connect(SimulatedTSL(seed=0))
+    tsl.set_sweep_start(1540)
+    tsl.set_sweep_stop(1541)
+    tsl.set_sweep_step(0.1)
+    nm_wavelength, _ = tsl.read_sweep_data()
+    tsl.set_wave_unit("THZ")
+    wavelength, power = tsl.read_sweep_data()
+    assert wavelength.size == power.size == 11
+    # 数据为4字节浮点数, THz换算回nm后约有1e-3nm的舍入误差
+    np.testing.assert_allclose(wavelength, nm_wavelength, atol=2e-3)
+    np.testing.assert_allclose(wavelength, np.linspace(1540, 1541, 11),
+                               atol=2e-3)
+
+
+def test_set_wave_unit_skips_unchanged_unit():
+    tsl, device = connect()
+    tsl.read_wave_unit()
+    sent = recording(device)
+    tsl.set_wave_unit("NM")
+    assert sent == []
+    tsl.set_wave_unit("THZ")
+    tsl.set_wave_unit(WavelengthUnit.THZ)
+    assert sent == [":UNIT:WAVelength 1"]
+
+
+def test_invalid_wavelength_raises_parameter_error():
+    tsl, device = connect()
+    tsl.set_wave_unit("THZ")
+    sent = recording(device)
+    with pytest.raises(ParameterError):
+        tsl.set_wavelength("1550abc")
+    with pytest.raises(ParameterError):
+        tsl.set_sweep_start(None)
+    assert sent == []
@@ -0,0 +1,45 @@
+import time
+
+import numpy as np
+
+from acquisition import SimulatedPowerMeter
+from pipeline import SweepPipeline, moving_average, process_block
+from units import nm_to_thz
+
+
+def test_moving_average_ignores_nan():
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0])
+    result = moving_average(values, 3)
+    assert np.isnan(result[2])
+    np.testing.assert_allclose(result[[0, 1, 3, 4]], [1.5, 1.5, 4.5, 4.5])
+
+
+def test_process_block_converts_axis_after_analysis():
+    x = np.linspace(1549, 1551, 20001)
+    block = np.stack([x, SimulatedPowerMeter.ring_transmission(x)])
+    resonances = process_block(block, unit="THz")
+    assert resonances.size == 3
+    assert np.all(np.abs(resonances["wavelength"] - 1550) < 1.0)
+    np.testing.assert_allclose(block[0], nm_to_thz(x))
+
+
+def test_pipeline_round_trip():
+    x = np.linspace(1545, 1555, 20001)
+    y = SimulatedPowerMeter.ring_transmission(x)
+    pipeline = SweepPipeline(workers=2)
+    try:
+        for label in ("a", "b", "c"):
+            assert pipeline.submit(label, x, y, unit="nm") is not None
+        done = []
+        deadline = time.monotonic() + 30
+        while len(done) < 3 and time.monotonic() < deadline:
+            done += pipeline.poll(max_points=500)
+            time.sleep(0.01)
+        assert sorted(item[0] for item in done) == ["a", "b", "c"]
+        for label, unit, axis, values, resonances, error in done:
+            assert error is None
+            assert resonances.size == 13
+            assert axis.size <= 500
+        assert not pipeline.pending
+    finally:
+        pipeline.close()
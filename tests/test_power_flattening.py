@@ -0,0 +1,29 @@
+import numpy as np
+
+from power_flattening import CalibrationStore, PowerCalibration, SteppedSweep
+
+
+class FakeLaser:
+    def __init__(self):
+        self.points = []
+
+    def set_wavelength_power(self, wavelength, power):
+        self.points.append((wavelength, power))
+
+
+def test_stepped_sweep_waits_for_last_dwell():
+    laser = FakeLaser()
+    sweep = SteppedSweep(laser, [1550.0, 1551.0], [0.0, 1.0])
+    assert sweep.step() is True
+    assert sweep.step() is True  # 最后一个点刚设置, 还要等待驻留时间
+    assert laser.points == [("1550.0000", "0.00"), ("1551.0000", "1.00")]
+    assert sweep.step() is False
+    assert len(laser.points) == 2
+
+
+def test_calibration_store_round_trip(tmp_path):
+    store = CalibrationStore(str(tmp_path / "calibration.json"))
+    assert store.load("A") is None
+    store.save(PowerCalibration("A", [1550, 1560], [0.0, -0.5], 0.0))
+    loaded = store.load("A")
+    np.testing.assert_allclose(loaded.power, [0.0, -0.5])
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from acquisition import SimulatedPowerMeter
+from resonance import analyze_sweep, find_resonances, fit_lorentzians
+
+
+def ring_spectrum(points=400000, noise=0.02, seed=0):
+    x = np.linspace(1500, 1600, points)
+    y = SimulatedPowerMeter.ring_transmission(x)
+    y = y + np.random.default_rng(seed).normal(0, noise, x.size)
+    return x, y
+
+
+def lorentzian_dips(x, centers, fwhm, extinction_db):
+    """若干洛伦兹凹陷相乘的透过率(dB)"""
+    peak = 1 - 10 ** (-extinction_db / 10)
+    linear = np.ones_like(x)
+    for center, width in zip(centers, fwhm):
+        linear *= 1 - peak / (1 + (2 * (x - center) / width) ** 2)
+    return 10 * np.log10(linear)
+
+
+def test_single_lorentzian_exact():
+    x = np.linspace(1549, 1551, 2001)
+    depth = 0.9 / (1 + (2 * (x - 1550.123) / 0.05) ** 2)
+    y = 10 * np.log10(1 - depth)
+    centers, half_widths, baseline = find_resonances(y, baseline=0.0)
+    result = fit_lorentzians(x, y, centers, half_widths, baseline)
+    assert result.size == 1
+    assert result["wavelength"][0] == pytest.approx(1550.123, abs=1e-6)
+    assert result["fwhm"][0] == pytest.approx(0.05, rel=1e-4)
+    assert result["extinction_db"][0] == pytest.approx(10.0, rel=1e-4)
+    assert result["q"][0] == pytest.approx(1550.123 / 0.05, rel=1e-4)
+
+
+def test_ring_spectrum():
+    x, y = ring_spectrum()
+    result = analyze_sweep(x, y)
+    assert result.size == 125
+    assert np.median(result["fwhm"]) == pytest.approx(0.02, rel=0.05)
+    assert np.median(result["extinction_db"]) == pytest.approx(13.0, abs=1.0)
+
+
+def test_zoomed_sweep_baseline():
+    # 窗口只覆盖几个谐振时, 基线不应被谐振尾部拉低
+    x = np.linspace(1549, 1551, 20001)
+    result = analyze_sweep(x, SimulatedPowerMeter.ring_transmission(x))
+    assert result.size == 3
+    np.testing.assert_allclose(result["wavelength"], [1549.2, 1550.0, 1550.8],
+                               atol=1e-4)
+    np.testing.assert_allclose(result["extinction_db"], 13.0, atol=0.5)
+    np.testing.assert_allclose(result["fwhm"], 0.02, rtol=0.03)
+
+
+def test_power_rolloff_keeps_all_resonances():
+    # 最后15%的波段功率滚降4dB, 滚动基线应跟随滚降
+    x, y = ring_spectrum()
+    y = y + np.where(x > 1585, -4 * (x - 1585) / 15, 0)
+    result = analyze_sweep(x, y)
+    assert result.size == 125
+    assert np.median(result["fwhm"]) == pytest.approx(0.02, rel=0.05)
+
+
+def test_broad_region_rejected():
+    # 全局基线下滚降段成为一个很宽的区域, 超过宽度上限应被舍弃
+    x, y = ring_spectrum(noise=0)
+    y = y + np.where(x > 1585, -4 * (x - 1585) / 15, 0)
+    baseline = np.percentile(y, 90)
+    centers, half_widths, _ = find_resonances(y, baseline=baseline)
+    assert half_widths.max() > 5000
+    centers, half_widths, _ = find_resonances(y, baseline=baseline,
+                                              max_width=0.01)
+    assert half_widths.max() < 200
+
+
+def test_single_resonance_window():
+    # 只含一个谐振的窄扫描: 尾部延伸到窗口两端, 基线不能跟随尾部
+    x = np.linspace(1549.9, 1550.1, 5001)
+    result = analyze_sweep(x, lorentzian_dips(x, [1550.0], [0.02], 10.0))
+    assert result.size == 1
+    assert result["extinction_db"][0] == pytest.approx(10.0, abs=0.02)
+    assert result["fwhm"][0] == pytest.approx(0.02, rel=1e-3)
+
+
+def test_mixed_mode_families():
+    # 两族谐振(如TE/TM)宽度相差10倍, 宽的不能被舍弃, 窄的不受其尾部影响
+    x = np.linspace(1540, 1560, 200001)
+    narrow = 1540.4 + 0.8 * np.arange(25)
+    broad = 1540.8 + 1.6 * np.arange(10)
+    y = (lorentzian_dips(x, narrow, [0.02] * 25, 10.0)
+         + lorentzian_dips(x, broad, [0.2] * 10, 10.0))
+    result = analyze_sweep(x, y)
+    assert result.size == 35
+    is_broad = result["fwhm"] > 0.1
+    np.testing.assert_allclose(result["wavelength"][is_broad], broad, atol=1e-3)
+    np.testing.assert_allclose(result["fwhm"][is_broad], 0.2, rtol=0.01)
+    np.testing.assert_allclose(result["wavelength"][~is_broad], narrow,
+                               atol=1e-4)
+    np.testing.assert_allclose(result["fwhm"][~is_broad], 0.02, rtol=0.01)
+    np.testing.assert_allclose(result["extinction_db"], 10.0, atol=0.1)
+
+
+def test_no_resonance():
+    x = np.linspace(1500, 1510, 1000)
+    assert analyze_sweep(x, np.zeros_like(x)).size == 0
+
+
+def test_unsorted_and_nan_input():
+    x, y = ring_spectrum(points=20000, noise=0)
+    y[::97] = np.nan
+    order = np.random.default_rng(1).permutation(x.size)
+    result = analyze_sweep(x[order], y[order])
+    assert result.size == 125
+    assert np.all(np.diff(result["wavelength"]) > 0)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from sweep_archive import SweepArchive, decimate
+
+
+def test_decimate_keeps_extremes_in_order():
+    x = np.arange(10000.0)
+    y = np.sin(x / 50.0)
+    y[1234] = 5.0
+    y[8765] = -5.0
+    xd, yd = decimate(x, y, 200)
+    assert xd.size <= 200
+    assert yd.max() == 5.0 and yd.min() == -5.0
+    assert np.all(np.diff(xd) >= 0)
+
+
+def test_decimate_short_input_unchanged():
+    x = np.arange(10.0)
+    xd, yd = decimate(x, x * 2, 100)
+    np.testing.assert_array_equal(xd, x)
+    np.testing.assert_array_equal(yd, x * 2)
+
+
+def test_save_query_load(tmp_path):
+    archive = SweepArchive(str(tmp_path))
+    try:
+        wavelength = np.linspace(1540, 1560, 2001)
+        first = archive.save_sweep(wavelength, np.zeros(wavelength.size),
+                                   {"start_nm": 1540, "stop_nm": 1560},
+                                   serial="A1")
+        second = archive.save_sweep(wavelength + 20, np.ones(wavelength.size),
+                                    serial="B2", kind="transmission")
+        assert [r["id"] for r in archive.query()] == [second, first]
+        assert [r["id"] for r in archive.query(serial="A1")] == [first]
+        assert [r["id"] for r in archive.query(wavelength=1570)] == [second]
+        assert [r["id"] for r in archive.query(kind="transmission")] == [second]
+
+        x, y = archive.load(second)
+        np.testing.assert_array_equal(x, wavelength + 20)
+        assert archive.load(first, max_points=100)[0].size <= 100
+        with pytest.raises(KeyError):
+            archive.load(999)
+    finally:
+        archive.close()
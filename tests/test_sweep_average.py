@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from sweep_average import SweepAccumulator
+
+
+def test_matches_numpy_statistics():
+    grid = np.linspace(1540, 1560, 201)
+    cycles = np.random.default_rng(0).normal(-10, 0.5, (7, grid.size))
+    acc = SweepAccumulator(grid)
+    for power in cycles:
+        acc.add_cycle(grid, power)
+    assert acc.cycles == 7
+    np.testing.assert_allclose(acc.mean, cycles.mean(axis=0))
+    np.testing.assert_allclose(acc.variance, cycles.var(axis=0, ddof=1))
+    np.testing.assert_allclose(acc.minimum, cycles.min(axis=0))
+    np.testing.assert_allclose(acc.maximum, cycles.max(axis=0))
+
+
+def test_interpolates_and_sorts_two_way_sweeps():
+    acc = SweepAccumulator.from_range(1540, 1550, 0.5)
+    assert acc.grid.size == 21
+    wavelength = np.linspace(1550, 1540, 101)  # 回程, 波长递减
+    acc.add_cycle(wavelength, wavelength - 1540)
+    np.testing.assert_allclose(acc.mean, acc.grid - 1540)
+
+
+def test_points_outside_cycle_are_not_counted():
+    acc = SweepAccumulator(np.linspace(0, 10, 11))
+    acc.add_cycle([0, 10], [1, 1])
+    acc.add_cycle([0, 5], [3, 3])
+    np.testing.assert_array_equal(acc.count, [2] * 6 + [1] * 5)
+    np.testing.assert_allclose(acc.mean, [2] * 6 + [1] * 5)
+    assert np.isnan(acc.variance[6:]).all()
+    assert acc.variance[0] == pytest.approx(2.0)
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        SweepAccumulator([1.0])
+    with pytest.raises(ValueError):
+        SweepAccumulator.from_range(1550, 1550, 0.1)
+    acc = SweepAccumulator(np.linspace(0, 1, 5))
+    with pytest.raises(ValueError):
+        acc.add_cycle([0, 1], [0, 1, 2])
+
+
+def test_reset():
+    acc = SweepAccumulator(np.linspace(0, 1, 5))
+    acc.add_cycle([0, 1], [1, 1])
+    acc.reset()
+    assert acc.cycles == 0
+    assert np.isnan(acc.mean).all()
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from units import SPEED_OF_LIGHT, is_thz, nm_to_thz, thz_to_nm
+
+
+def test_scalar_conversion():
+    assert nm_to_thz(1550.0) == pytest.approx(193.41449, rel=1e-7)
+    assert thz_to_nm(nm_to_thz(1550.0)) == pytest.approx(1550.0)
+    assert np.ndim(nm_to_thz(1550.0)) == 0
+
+
+def test_array_conversion_in_place():
+    wavelength = np.linspace(1500, 1600, 11)
+    out = wavelength.copy()
+    assert nm_to_thz(out, out=out) is out
+    np.testing.assert_allclose(out * wavelength, SPEED_OF_LIGHT)
+    np.testing.assert_allclose(thz_to_nm(out), wavelength)
+
+
+@pytest.mark.parametrize("unit, expected", [("THz", True), ("thz", True),
+                                            ("nm", False), ("NM", False)])
+def test_is_thz(unit, expected):
+    assert is_thz(unit) is expected
@@ -0,0 +1,27 @@
+"""波长与光频率的单位换算
+
+程序内部统一使用波长(nm), 只在显示、导出或与仪器通信时换算。
+函数同时支持标量和数组, 数组按元素换算。
+"""
+import numpy as np
+
+# 真空中的光速(nm·THz), 频率(THz) = SPEED_OF_LIGHT / 波长(nm)
+SPEED_OF_LIGHT = 299792.458
+
+
+def nm_to_thz(wavelength, out=None):
+    """波长(nm)换算为频率(THz)"""
+    return np.divide(SPEED_OF_LIGHT, np.asarray(wavelength, dtype=np.float64),
+                     out=out)
+
+
+def thz_to_nm(frequency, out=None):
+    """频率(THz)换算为波长(nm)"""
+    return np.divide(SPEED_OF_LIGHT, np.asarray(frequency, dtype=np.float64),
+                     out=out)
+
+
+def is_thz(unit):
+    """unit 为单位名称('nm'/'THz', 不区分大小写)或 WavelengthUnit"""
+    return getattr(unit, "name", unit).upper() == "THZ"
+